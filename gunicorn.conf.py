@@ -0,0 +1,22 @@
+"""
+Gunicorn configuration for serving the project.
+
+By default the WSGI application runs on sync workers, which measured faster
+than Uvicorn workers on the ASGI application (see "Async endpoints" in the
+README). To serve the async read endpoints under ``/async/`` over ASGI, or to
+compare both paths under the same worker count::
+
+    gunicorn social_networking_project.wsgi:application
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn social_networking_project.asgi:application
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+threads = int(os.getenv("GUNICORN_THREADS", 1))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SocialNetworkingAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "social_networking_app"
+
+    def ready(self):
+        # Register signal handlers and system checks
+        from . import checks, signals  # noqa: F401
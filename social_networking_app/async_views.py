@@ -0,0 +1,169 @@
+"""
+Async versions of the read endpoints, for deployments served over ASGI.
+
+Authentication and throttling reuse the configured DRF classes in one hop to
+a worker thread; the queries themselves run on Django's async ORM so a worker
+can serve other requests while waiting on the database. Lists use keyset
+pagination.
+"""
+
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db.models import F
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .models import Friend, FriendRequest
+from .pagination import KeysetPagination, get_total_count
+from .renderers import FastJSONRenderer
+from .search import asearch_users
+from .serializers import UserSearchSerializer
+from .views import parse_since
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+# Logs written on every request, rate limited in LOGGING
+request_logger = logging.getLogger(f"{__name__}.requests")
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        status=status_code,
+        content_type="application/json",
+    )
+
+
+class AsyncAPIView(View):
+    """
+    Base class for async read-only endpoints.
+    """
+
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    pagination_class = KeysetPagination
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Subclasses define async handlers (get), which receive the DRF request
+        try:
+            drf_request = await sync_to_async(self.initial)(request)
+        except exceptions.APIException as exc:
+            return self.handle_exception(request, exc)
+        return await super().dispatch(drf_request, *args, **kwargs)
+
+    def handle_exception(self, request, exc):
+        # Mirror APIView: without a WWW-Authenticate challenge, 401 becomes 403
+        response = json_response({"detail": exc.detail}, exc.status_code)
+        if isinstance(
+            exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+        ):
+            authenticate_header = (
+                self.authentication_classes[0]().authenticate_header(request)
+                if self.authentication_classes
+                else None
+            )
+            if authenticate_header:
+                response["WWW-Authenticate"] = authenticate_header
+            else:
+                response.status_code = status.HTTP_403_FORBIDDEN
+        if getattr(exc, "wait", None):
+            response["Retry-After"] = "%d" % exc.wait
+        return response
+
+    def initial(self, request):
+        """
+        Authenticate and throttle the request, return it wrapped for DRF.
+        """
+        drf_request = Request(
+            request, authenticators=[auth() for auth in self.authentication_classes]
+        )
+        if not drf_request.user or not drf_request.user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            if not throttle.allow_request(drf_request, self):
+                raise exceptions.Throttled(throttle.wait())
+        return drf_request
+
+    async def paginate(self, request, queryset):
+        """
+        Fetch one keyset page of the queryset, return (paginator, rows).
+        """
+        paginator = self.pagination_class()
+        page_queryset = paginator.get_page_queryset(queryset, request, view=self)
+        if paginator.include_count:
+            paginator.count = get_total_count(self, request)
+            if paginator.count is None:
+                paginator.count = await queryset.acount()
+        rows = paginator.paginate_rows([row async for row in page_queryset])
+        return paginator, rows
+
+
+class AsyncFriendListView(AsyncAPIView):
+    cursor_ordering = ("id",)
+    total_count_field = "friend_count"
+
+    async def get(self, request):
+        # Get the list of friends for the authenticated user.
+        request_logger.info("Async friend list request received")  # Log an info message
+        queryset = Friend.objects.friend_list(request.user)
+        paginator, rows = await self.paginate(request, queryset)
+        return json_response(paginator.get_paginated_data(rows))
+
+
+class AsyncUserSearchView(AsyncAPIView):
+    cursor_ordering = ("search_rank", "id")
+
+    async def get(self, request):
+        # List users based on search query.
+        request_logger.info("Async user search request received")  # Log an info message
+        search_keyword = request.query_params.get("q")
+        if not search_keyword:
+            logger.warning("Search keyword is missing")  # Log a warning message
+            return json_response(
+                {"error": "Search keyword 'q' is required."},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        users = await asearch_users(search_keyword)
+        users = users.only(*UserSearchSerializer.Meta.fields)
+        paginator, rows = await self.paginate(request, users)
+        data = UserSearchSerializer(rows, many=True).data
+        return json_response(paginator.get_paginated_data(data))
+
+
+class AsyncPendingRequestsView(AsyncAPIView):
+    cursor_ordering = ("created_at", "id")
+    total_count_field = "pending_request_count"
+    total_count_filters = ("since",)  # The counter holds every pending request
+
+    async def get(self, request):
+        # List pending friend requests for the current user, newest last.
+        friend_requests = FriendRequest.objects.filter(
+            to_user=request.user, accepted=False
+        )
+        since = request.query_params.get("since")
+        if since:
+            since_datetime = parse_since(since)
+            if since_datetime is None:
+                logger.warning("Invalid 'since' filter for pending requests")
+                return json_response(
+                    {"error": "'since' must be an ISO 8601 datetime."},
+                    status.HTTP_400_BAD_REQUEST,
+                )
+            friend_requests = friend_requests.filter(created_at__gt=since_datetime)
+
+        friend_requests = friend_requests.values(
+            "id", "created_at", from_user_email=F("from_user__email")
+        )
+        paginator, rows = await self.paginate(request, friend_requests)
+        return json_response(paginator.get_paginated_data(rows))
+
+
+class AsyncPendingCountView(AsyncAPIView):
+    async def get(self, request):
+        # Count pending friend requests, e.g. for an inbox badge.
+        return json_response({"count": request.user.pending_request_count})
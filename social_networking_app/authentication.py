@@ -0,0 +1,165 @@
+"""
+Token authentication with an in-process cache of token to user lookups.
+
+``TokenAuthentication`` joins the token and user tables on every request.
+``CachedTokenAuthentication`` keeps the resolved token and user in a bounded
+LRU for ``AUTH_TOKEN_CACHE_TTL`` seconds. Entries are dropped when their
+token is deleted or their user is saved (e.g. deactivated) or has its friends
+version bumped, see ``signals.py``.
+
+Deleted tokens and saved users are also published as revocation markers in
+the default cache, kept for the TTL, and a cached token is only used while
+neither its key nor its user has one. With a cache shared by the workers
+(``CACHE_URL``), a revoked token is refused by all of them on its next
+request; with the per-process default, other workers accept it until their
+entry expires.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+
+def revoked_key_marker(key):
+    return f"auth-token-revoked:{key}"
+
+
+def revoked_user_marker(user_id):
+    return f"auth-token-user-revoked:{user_id}"
+
+
+class TokenCache:
+    def __init__(self, max_size=None, ttl=None):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()  # key -> (token, expires)
+        self._keys_by_user = {}
+        self._generation = 0  # Bumped by every invalidation, guards loads
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_size(self):
+        if self._max_size is None:
+            return getattr(settings, "AUTH_TOKEN_CACHE_SIZE", 10000)
+        return self._max_size
+
+    @property
+    def ttl(self):
+        if self._ttl is None:
+            return getattr(settings, "AUTH_TOKEN_CACHE_TTL", 30)
+        return self._ttl
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Return the cached token of the key, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                self._discard(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        token = entry[0]
+        markers = [revoked_key_marker(key), revoked_user_marker(token.user_id)]
+        if cache.get_many(markers):
+            # Revoked by another worker since it was cached
+            self.invalidate_keys(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return token
+
+    def set(self, key, token, generation):
+        # Skip the store if an invalidation raced with the load, it may be stale
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._discard(key)
+            self._entries[key] = (token, time.monotonic() + self.ttl)
+            self._keys_by_user.setdefault(token.user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_keys(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._discard(key)
+
+    def revoke_keys(self, *keys):
+        # Deleted tokens, for every worker sharing the default cache
+        cache.set_many(
+            {revoked_key_marker(key): True for key in keys}, timeout=self.ttl
+        )
+        self.invalidate_keys(*keys)
+
+    def revoke_users(self, *user_ids):
+        # Saved or deleted users, e.g. deactivated, for every worker sharing
+        # the default cache
+        cache.set_many(
+            {revoked_user_marker(user_id): True for user_id in user_ids},
+            timeout=self.ttl,
+        )
+        self.invalidate_users(*user_ids)
+
+    def invalidate_users(self, *user_ids):
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                for key in list(self._keys_by_user.get(user_id, ())):
+                    self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self.hits = self.misses = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            user_id = entry[0].user_id
+            keys = self._keys_by_user[user_id]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication resolving tokens through ``token_cache``.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            generation = token_cache.generation
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token, generation)
+        # Requests get their own copy, views may change request.user
+        return copy.copy(token.user), token
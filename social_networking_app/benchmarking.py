@@ -0,0 +1,52 @@
+"""
+Small helpers shared by the benchmark management commands.
+"""
+
+import time
+from contextlib import contextmanager
+
+
+def percentile(samples, pct):
+    """
+    Return the pct-th percentile of the samples (nearest-rank method).
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples):
+    """
+    Summarize latency samples given in seconds as milliseconds.
+    """
+    return {
+        "n": len(samples),
+        "mean_ms": (sum(samples) / len(samples) * 1000) if samples else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": max(samples) * 1000 if samples else 0.0,
+    }
+
+
+def format_summary(label, summary):
+    # Render a summary as a single aligned report line
+    return (
+        f"{label:<32} n={summary['n']:<6} mean={summary['mean_ms']:8.3f}ms "
+        f"p50={summary['p50_ms']:8.3f}ms p95={summary['p95_ms']:8.3f}ms "
+        f"p99={summary['p99_ms']:8.3f}ms max={summary['max_ms']:8.3f}ms"
+    )
+
+
+@contextmanager
+def timed(samples):
+    """
+    Append the wall-clock duration of the block, in seconds, to samples.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        samples.append(time.perf_counter() - start)
@@ -0,0 +1,44 @@
+"""
+System checks for settings that only work with a cache shared by every
+worker process.
+"""
+
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = ("django.core.cache.backends.locmem.LocMemCache",)
+CACHED_SESSION_ENGINES = (
+    "django.contrib.sessions.backends.cache",
+    "django.contrib.sessions.backends.cached_db",
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    # With a per-process cache, a logout, password change or deactivation on
+    # one worker leaves the session or user cached on the others
+    backend = settings.CACHES["default"]["BACKEND"]
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    uses = []
+    if settings.SESSION_ENGINE in CACHED_SESSION_ENGINES:
+        uses.append(f"SESSION_ENGINE {settings.SESSION_ENGINE}")
+    if getattr(settings, "USER_CACHE_TIMEOUT", 0):
+        uses.append("USER_CACHE_TIMEOUT")
+    if not uses:
+        return []
+    # A single development server has one process, the cache is shared there
+    level = Warning if settings.DEBUG else Error
+    return [
+        level(
+            f"The default cache {backend} is not shared by worker processes, "
+            f"but {' and '.join(uses)} rely on it.",
+            hint="Set CACHE_URL to a Redis or Memcached server, or use "
+            "SESSION_BACKEND=db and USER_CACHE_TIMEOUT=0.",
+            id=(
+                "social_networking_app.E001"
+                if level is Error
+                else "social_networking_app.W001"
+            ),
+        )
+    ]
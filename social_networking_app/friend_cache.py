@@ -0,0 +1,181 @@
+"""
+In-process cache of the friend graph.
+
+Each cached user maps to a sorted ``array('q')`` of friend ids, so membership
+checks are a binary search and friend lists need no database round trip.
+Friend ids are handed out as copies of the arrays. The
+cache is filled lazily from ``Friend``, kept up to date incrementally when
+friendships are created or deleted, and evicts the least recently used users
+once its memory budget is exceeded.
+
+A friendship made through another worker only reaches this process's copy
+of a friend list when the entry expires, ``FRIEND_GRAPH_CACHE_TTL`` seconds
+after it was loaded.
+"""
+
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from django.conf import settings
+
+ENTRY_OVERHEAD = 64  # Approximate bytes per entry besides the id array
+LOAD_CHUNK_SIZE = 500
+
+
+class FriendGraphCache:
+    def __init__(self, max_bytes=None):
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._expires = {}
+        self._bytes = 0
+        self._generation = 0  # Bumped by every write, guards concurrent loads
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_bytes(self):
+        if self._max_bytes is None:
+            return getattr(settings, "FRIEND_GRAPH_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+        return self._max_bytes
+
+    @property
+    def ttl(self):
+        return getattr(settings, "FRIEND_GRAPH_CACHE_TTL", 60)
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, user_id):
+        return user_id in self._entries
+
+    def friend_ids(self, user_id):
+        """
+        Return the sorted friend ids of a user.
+        """
+        return self._get_many([user_id])[user_id][:]
+
+    def get_many(self, user_ids):
+        """
+        Return {user_id: sorted friend ids}, loading all misses in one pass.
+        """
+        # Copies, callers must not be able to change the cached arrays
+        return {user_id: ids[:] for user_id, ids in self._get_many(user_ids).items()}
+
+    def are_friends(self, user_id, other_id):
+        """
+        Return True when the two users are friends.
+        """
+        ids = self._get_many([user_id])[user_id]
+        position = bisect_left(ids, other_id)
+        return position < len(ids) and ids[position] == other_id
+
+    def _get_many(self, user_ids):
+        # Like get_many, but returns the cached arrays themselves
+        result = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for user_id in user_ids:
+                ids = self._entries.get(user_id)
+                if ids is not None and self._expires[user_id] <= now:
+                    self._discard(user_id)
+                    ids = None
+                if ids is None:
+                    missing.append(user_id)
+                else:
+                    self._entries.move_to_end(user_id)
+                    result[user_id] = ids
+            self.hits += len(result)
+            self.misses += len(missing)
+            generation = self._generation
+        if missing:
+            loaded = self._load(missing)
+            with self._lock:
+                # Drop the load if a write raced with it, it may be stale
+                store = generation == self._generation
+                for user_id, ids in loaded.items():
+                    if store:
+                        self._store(user_id, ids)
+                    result[user_id] = ids
+        return result
+
+    def add_edges(self, pairs):
+        # Record new (user_id, friend_id) edges for the users that are cached
+        with self._lock:
+            self._generation += 1
+            for user_id, friend_id in pairs:
+                ids = self._entries.get(user_id)
+                if ids is not None:
+                    position = bisect_left(ids, friend_id)
+                    if position == len(ids) or ids[position] != friend_id:
+                        insort(ids, friend_id)
+                        self._bytes += ids.itemsize
+            self._evict()
+
+    def remove_edges(self, pairs):
+        # Forget (user_id, friend_id) edges for the users that are cached
+        with self._lock:
+            self._generation += 1
+            for user_id, friend_id in pairs:
+                ids = self._entries.get(user_id)
+                if ids is not None:
+                    position = bisect_left(ids, friend_id)
+                    if position < len(ids) and ids[position] == friend_id:
+                        del ids[position]
+                        self._bytes -= ids.itemsize
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                self._discard(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._expires.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+
+    def _load(self, user_ids):
+        from .models import Friend
+
+        loaded = {user_id: [] for user_id in user_ids}
+        for start in range(0, len(user_ids), LOAD_CHUNK_SIZE):
+            chunk = user_ids[start : start + LOAD_CHUNK_SIZE]
+            for user_id, friend_id in Friend.objects.friend_pairs(chunk):
+                loaded[user_id].append(friend_id)
+        return {user_id: array("q", sorted(ids)) for user_id, ids in loaded.items()}
+
+    def _store(self, user_id, ids):
+        self._discard(user_id)
+        self._entries[user_id] = ids
+        self._expires[user_id] = time.monotonic() + self.ttl
+        self._bytes += self._entry_size(ids)
+        self._evict()
+
+    def _discard(self, user_id):
+        ids = self._entries.pop(user_id, None)
+        if ids is not None:
+            del self._expires[user_id]
+            self._bytes -= self._entry_size(ids)
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            self._discard(next(iter(self._entries)))
+
+    @staticmethod
+    def _entry_size(ids):
+        return ENTRY_OVERHEAD + len(ids) * ids.itemsize
+
+
+friend_graph = FriendGraphCache()
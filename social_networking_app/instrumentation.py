@@ -0,0 +1,261 @@
+"""
+Per-request query and timing metrics.
+
+``RequestMetricsMiddleware`` starts a ``RequestMetrics`` for each request in
+a context variable. Every database connection records its queries into it
+(see ``record_query``, installed when a connection is created), the view
+callable is timed from ``process_view`` until it returns its response, and
+serializers add the time they spend with ``phase("serializer")``. The
+metrics are sent back in a ``Server-Timing`` header, added to a rolling
+per-route summary and checked against ``QUERY_BUDGETS``.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .benchmarking import summarize
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.phases = {}
+        self._active = set()
+        self._view_start = None
+
+    def add_phase(self, name, duration):
+        self.phases[name] = self.phases.get(name, 0.0) + duration
+
+    def start_view(self):
+        self._view_start = time.perf_counter()
+
+    def stop_view(self):
+        # Once, whichever of process_template_response or the middleware's
+        # return comes first
+        if self._view_start is not None:
+            self.add_phase("view", time.perf_counter() - self._view_start)
+            self._view_start = None
+
+
+def current_metrics():
+    """
+    Return the metrics of the request being handled, or None.
+    """
+    return _current.get()
+
+
+@contextmanager
+def phase(name):
+    """
+    Add the duration of the block to the named phase of the current request.
+    Nested blocks of the same phase are only counted once.
+    """
+    metrics = _current.get()
+    if metrics is None or name in metrics._active:
+        yield
+        return
+    metrics._active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._active.discard(name)
+        metrics.add_phase(name, time.perf_counter() - start)
+
+
+def record_query(execute, sql, params, many, context):
+    # Database execute wrapper counting and timing queries of the request
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+class RouteStats:
+    """
+    Rolling per-route summary of the last ``window`` requests.
+    """
+
+    def __init__(self, window=None):
+        self._window = window
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    @property
+    def window(self):
+        if self._window is None:
+            return getattr(settings, "REQUEST_METRICS_WINDOW", 1000)
+        return self._window
+
+    def add(self, route, total, metrics):
+        samples = self._routes.get(route)
+        if samples is None:
+            with self._lock:
+                samples = self._routes.setdefault(route, deque(maxlen=self.window))
+        samples.append(
+            (
+                total,
+                metrics.db_time,
+                metrics.queries,
+                metrics.phases.get("serializer", 0.0),
+                metrics.phases.get("view", 0.0),
+            )
+        )
+
+    def summary(self):
+        """
+        Return {route: latency percentiles and mean/max query counts}.
+        """
+        result = {}
+        for route, samples in sorted(self._routes.items()):
+            samples = list(samples)
+            queries = [sample[2] for sample in samples]
+            result[route] = dict(
+                summarize([sample[0] for sample in samples]),
+                mean_db_ms=sum(sample[1] for sample in samples) / len(samples) * 1000,
+                mean_serializer_ms=sum(sample[3] for sample in samples)
+                / len(samples)
+                * 1000,
+                mean_view_ms=sum(sample[4] for sample in samples) / len(samples) * 1000,
+                mean_queries=sum(queries) / len(queries),
+                max_queries=max(queries),
+            )
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+
+route_stats = RouteStats()
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure queries, database, view and serializer time of each request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Async hooks, so Django doesn't run them in a thread
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        metrics.stop_view()
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        metrics.stop_view()
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.start_view()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after this, in their render phase
+        self.stop_view()
+        return response
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.start_view()
+
+    async def aprocess_template_response(self, request, response):
+        self.stop_view()
+        return response
+
+    @staticmethod
+    def start_view():
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.start_view()
+
+    @staticmethod
+    def stop_view():
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.stop_view()
+
+    def finish(self, request, response, metrics, total):
+        match = request.resolver_match
+        route = match.url_name if match and match.url_name else None
+        if route:
+            route_stats.add(route, total, metrics)
+        if getattr(settings, "REQUEST_METRICS_SERVER_TIMING", True):
+            response["Server-Timing"] = self.server_timing(metrics, total)
+        self.check_budget(route, metrics)
+        return response
+
+    @staticmethod
+    def server_timing(metrics, total):
+        entries = [
+            f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"'
+        ]
+        entries += [
+            f"{name};dur={duration * 1000:.1f}"
+            for name, duration in metrics.phases.items()
+        ]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+    @staticmethod
+    def check_budget(route, metrics):
+        budget = getattr(settings, "QUERY_BUDGETS", {}).get(route)
+        if budget is None or metrics.queries <= budget:
+            return
+        view_ms = metrics.phases.get("view", 0.0) * 1000
+        logger.warning(
+            "Route %s ran %d queries, over its budget of %d (view %.1f ms)",
+            route,
+            metrics.queries,
+            budget,
+            view_ms,
+        )
+        if getattr(settings, "QUERY_BUDGET_ENFORCE", False):
+            raise QueryBudgetExceeded(
+                f"Route {route} ran {metrics.queries} queries, "
+                f"over its budget of {budget} (view {view_ms:.1f} ms)."
+            )
@@ -0,0 +1,112 @@
+"""
+Logging handlers and filters that keep log I/O off the request thread.
+
+``BackgroundFileHandler`` only puts records on a bounded queue; a
+``QueueListener`` thread formats them and writes them to the file.
+``RateLimitFilter`` caps how often the same message is logged, for log calls
+on hot paths such as "request received".
+"""
+
+import copy
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+
+class BackgroundFileHandler(QueueHandler):
+    """
+    Write records to a file from a background thread.
+
+    When the queue is full, records are dropped (and counted in ``dropped``)
+    rather than blocking the caller.
+    """
+
+    def __init__(self, filename, mode="a", encoding=None, delay=True, queue_size=10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.target = logging.FileHandler(filename, mode, encoding, delay)
+        self.dropped = 0
+        self._start_listener()
+
+    def _start_listener(self):
+        self.listener = QueueListener(
+            self.queue, self.target, respect_handler_level=True
+        )
+        self.listener.start()
+        self._running = True
+        self._pid = os.getpid()
+
+    def _stop_listener(self):
+        if self._running:
+            self.listener.stop()
+            self._running = False
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread, in the file handler
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Merge the arguments now, they may change once the caller moves on
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            # The listener thread did not survive a fork, e.g. gunicorn --preload
+            self._start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        # Wait until the listener has written everything queued so far
+        if self._running:
+            self._stop_listener()
+            self._start_listener()
+        self.target.flush()
+
+    def close(self):
+        self._stop_listener()
+        self.target.close()
+        super().close()
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let at most ``rate`` records with the same message through per ``period``
+    seconds. Beyond that, one in ``sample_every`` records is still let through
+    (0 drops them all). Records above ``max_level`` always pass.
+    """
+
+    def __init__(self, rate=10, period=1.0, sample_every=100, max_level="INFO"):
+        super().__init__()
+        self.rate = rate
+        self.period = period
+        self.sample_every = sample_every
+        self.max_level = logging.getLevelName(max_level)
+        self.dropped = 0
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > self.max_level:
+            return True
+        key = (record.name, record.msg)  # The template, not the formatted message
+        window = int(time.monotonic() // self.period)
+        with self._lock:
+            start, count = self._windows.get(key, (window, 0))
+            count = count + 1 if start == window else 1
+            self._windows[key] = (window, count)
+            over = count - self.rate
+            if over <= 0 or (self.sample_every and over % self.sample_every == 0):
+                return True
+            self.dropped += 1
+            return False
@@ -0,0 +1,82 @@
+import base64
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.authentication import BasicAuthentication, TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from social_networking_app.authentication import (
+    CachedTokenAuthentication,
+    token_cache,
+)
+from social_networking_app.benchmarking import format_summary, summarize, timed
+from social_networking_app.models import CustomUser
+
+EMAIL = "benchmark.auth@example.com"
+PASSWORD = "benchmark-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the authentication overhead of one request with Basic "
+        "authentication (a password hash per request), TokenAuthentication "
+        "and CachedTokenAuthentication. Runs against a throwaway user in a "
+        "rolled back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=2000)
+        parser.add_argument(
+            "--basic-iterations",
+            type=int,
+            default=20,
+            help="Basic authentication hashes the password, keep this low.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = CustomUser.objects.create_user(email=EMAIL, password=PASSWORD)
+            token = Token.objects.create(user=user)
+            credentials = base64.b64encode(f"{EMAIL}:{PASSWORD}".encode()).decode()
+            token_cache.clear()
+            for label, authenticator, header, iterations in (
+                (
+                    "Basic",
+                    BasicAuthentication(),
+                    f"Basic {credentials}",
+                    options["basic_iterations"],
+                ),
+                (
+                    "Token",
+                    TokenAuthentication(),
+                    f"Token {token.key}",
+                    options["iterations"],
+                ),
+                (
+                    "Cached token",
+                    CachedTokenAuthentication(),
+                    f"Token {token.key}",
+                    options["iterations"],
+                ),
+            ):
+                self.stdout.write(
+                    format_summary(
+                        label, self.measure(authenticator, header, iterations)
+                    )
+                )
+            token_cache.clear()
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def measure(authenticator, header, iterations):
+        factory = APIRequestFactory()
+        samples = []
+        for _ in range(iterations):
+            request = Request(factory.get("/", HTTP_AUTHORIZATION=header))
+            with timed(samples):
+                authenticated = authenticator.authenticate(request)
+            if authenticated is None:
+                raise CommandError(f"{header.split()[0]} authentication failed.")
+        return summarize(samples)
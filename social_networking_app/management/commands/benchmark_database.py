@@ -0,0 +1,122 @@
+import random
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, IntegrityError, connections, transaction
+
+from social_networking_app.benchmarking import format_summary, summarize, timed
+from social_networking_app.models import CustomUser, Friend, FriendRequest
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent read/write throughput of the configured database: "
+        "reader threads page through friend lists while writer threads create "
+        "and delete friend requests. Run it once per DATABASE_URL / SQLITE_TUNED "
+        "setting to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--duration", type=float, default=10, help="Seconds.")
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        alias = options["database"]
+        user_ids = list(
+            CustomUser.objects.using(alias)
+            .order_by("?")
+            .values_list("id", flat=True)[:1000]
+        )
+        if len(user_ids) < 2:
+            self.stderr.write(
+                "Need at least two users, seed some with "
+                "`manage.py benchmark_user_search --seed-users N`."
+            )
+            return
+
+        self.stdout.write(self.describe(alias))
+        samples = {"read": [], "write": []}
+        errors = Counter()
+        lock = threading.Lock()
+        deadline = time.monotonic() + options["duration"]
+
+        def worker(kind, seed):
+            rng = random.Random(seed)
+            operation = self.read if kind == "read" else self.write
+            thread_samples = []
+            thread_errors = Counter()
+            try:
+                while time.monotonic() < deadline:
+                    try:
+                        with timed(thread_samples):
+                            operation(alias, rng, user_ids, options["page_size"])
+                    except DatabaseError as exc:
+                        # e.g. "database is locked" when SQLite writers collide
+                        thread_errors[f"{kind}: {exc}"] += 1
+            finally:
+                connections[alias].close()
+            with lock:
+                samples[kind].extend(thread_samples)
+                errors.update(thread_errors)
+
+        threads = [
+            threading.Thread(target=worker, args=("read", options["seed"] + i))
+            for i in range(options["readers"])
+        ] + [
+            threading.Thread(target=worker, args=("write", options["seed"] - i - 1))
+            for i in range(options["writers"])
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        for kind, kind_samples in samples.items():
+            self.stdout.write(
+                format_summary(kind, summarize(kind_samples))
+                + f" ({len(kind_samples) / elapsed:,.0f} ops/s)"
+            )
+        for error, count in errors.most_common():
+            self.stdout.write(f"{count} x {error}")
+
+    def read(self, alias, rng, user_ids, page_size):
+        user = CustomUser(pk=rng.choice(user_ids))
+        list(Friend.objects.friend_list(user).using(alias).order_by("id")[:page_size])
+        FriendRequest.objects.using(alias).filter(
+            to_user_id=rng.choice(user_ids), accepted=False
+        ).count()
+
+    def write(self, alias, rng, user_ids, page_size):
+        # Create and remove a request, leaving the data as it was
+        from_user_id, to_user_id = rng.sample(user_ids, 2)
+        try:
+            with transaction.atomic(using=alias):
+                friend_request = FriendRequest.objects.using(alias).create(
+                    from_user_id=from_user_id, to_user_id=to_user_id
+                )
+        except IntegrityError:
+            return  # A real request already exists between them
+        FriendRequest.objects.using(alias).filter(pk=friend_request.pk).delete()
+
+    def describe(self, alias):
+        connection = connections[alias]
+        description = (
+            f"{connection.vendor} database {connection.settings_dict['NAME']}, "
+            f"CONN_MAX_AGE={connection.settings_dict['CONN_MAX_AGE']}"
+        )
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                pragmas = []
+                for name in ("journal_mode", "synchronous", "busy_timeout"):
+                    cursor.execute(f"PRAGMA {name}")
+                    pragmas.append(f"{name}={cursor.fetchone()[0]}")
+            description += ", " + ", ".join(pragmas)
+        return description
@@ -0,0 +1,277 @@
+import json
+import platform
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from social_networking_app import urls
+from social_networking_app.benchmarking import format_summary, summarize, timed
+from social_networking_app.models import CustomUser, Friend, FriendRequest
+
+NO_THROTTLE_STORE = {
+    "BACKEND": "social_networking_app.throttle_stores.NullCounterStore"
+}
+
+
+def route(method="get", kwargs=None, query=None, data=None):
+    return SimpleNamespace(
+        method=method, kwargs=kwargs or {}, query=query or {}, data=data
+    )
+
+
+# How to call each named route in social_networking_app/urls.py, given the
+# benchmark context; None when the data to call it is missing. Routes missing
+# here are reported as skipped.
+SCENARIOS = {
+    "friend-list": lambda ctx: route(query={"page_size": 20}),
+    "friend-ids": lambda ctx: route(),
+    "friend-check": lambda ctx: route(kwargs={"user_id": ctx.stranger.pk}),
+    "friend-path": lambda ctx: route(kwargs={"user_id": ctx.stranger.pk}),
+    "friend-suggestions": lambda ctx: route(),
+    "user-search": lambda ctx: route(query={"q": ctx.stranger.email[:6]}),
+    "friend-requests": lambda ctx: route("post", data={"to_user": ctx.stranger.email}),
+    "friend-requests-bulk": lambda ctx: route(
+        "post", data={"emails": ctx.stranger_emails}
+    ),
+    "friend-requests-bulk-accept": lambda ctx: ctx.pending_ids
+    and route("post", data={"ids": ctx.pending_ids}),
+    "friend-requests-bulk-reject": lambda ctx: ctx.pending_ids
+    and route("post", data={"ids": ctx.pending_ids}),
+    "friend-requests-accept": lambda ctx: ctx.pending_ids
+    and route("post", kwargs={"pk": ctx.pending_ids[0]}),
+    "friend-requests-reject": lambda ctx: ctx.pending_ids
+    and route("post", kwargs={"pk": ctx.pending_ids[0]}),
+    "list-pending-requests": lambda ctx: route(query={"page_size": 20}),
+    "pending-requests-count": lambda ctx: route(),
+    "async-friend-list": lambda ctx: route(query={"page_size": 20}),
+    "async-user-search": lambda ctx: route(query={"q": ctx.stranger.email[:6]}),
+    "async-list-pending-requests": lambda ctx: route(query={"page_size": 20}),
+    "async-pending-requests-count": lambda ctx: route(),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every named route of the app as one user: latency "
+        "percentiles, queries per request and table scans. Write requests run "
+        "in rolled back transactions. Seed data with generate_social_graph."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument(
+            "--email", help="User to send requests as, defaults to the best connected."
+        )
+        parser.add_argument("--route", action="append", dest="routes")
+        parser.add_argument("--output", help="Save the results to this JSON file.")
+        parser.add_argument("--compare", help="Baseline JSON file to compare with.")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=20,
+            help="Percent p99 increase reported as a regression.",
+        )
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **options):
+        ctx = self.build_context(options["email"])
+        client = APIClient()
+        client.force_authenticate(user=ctx.user)
+        self.stdout.write(
+            f"Benchmarking as {ctx.user.email} ({ctx.friend_count} friends, "
+            f"{len(ctx.pending_ids)} pending requests), "
+            f"{options['iterations']} iterations per route"
+        )
+
+        results = {}
+        with override_settings(THROTTLE_STORE=NO_THROTTLE_STORE):
+            for name in self.route_names(options["routes"]):
+                scenario = SCENARIOS.get(name)
+                if scenario is None:
+                    self.stdout.write(f"{name:<32} skipped, no scenario")
+                    continue
+                spec = scenario(ctx)
+                if not spec:
+                    self.stdout.write(f"{name:<32} skipped, no data to call it")
+                    continue
+                results[name] = self.run(client, name, spec, options["iterations"])
+
+        # Each friendship counts once for both of its users
+        friend_counts = CustomUser.objects.aggregate(n=Coalesce(Sum("friend_count"), 0))
+        report = {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "vendor": connection.vendor,
+                "python": platform.python_version(),
+                "users": CustomUser.objects.count(),
+                "friendships": friend_counts["n"] // 2,
+                "pending_requests": FriendRequest.objects.count(),
+                "iterations": options["iterations"],
+            },
+            "routes": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Saved results to {options['output']}")
+        if options["compare"]:
+            with open(options["compare"]) as baseline:
+                regressions = self.compare(
+                    json.load(baseline), report, options["threshold"]
+                )
+            if regressions and options["fail_on_regression"]:
+                raise CommandError(f"Regressions in {', '.join(regressions)}.")
+
+    def build_context(self, email):
+        if email:
+            user = CustomUser.objects.filter(email=email).first()
+            if user is None:
+                raise CommandError(f"No user with email {email}.")
+        else:
+            user = CustomUser.objects.order_by("-friend_count", "id").first()
+            if user is None:
+                raise CommandError("No users, run generate_social_graph first.")
+
+        pending_ids = list(
+            FriendRequest.objects.filter(to_user=user, accepted=False)
+            .order_by("id")
+            .values_list("id", flat=True)[:10]
+        )
+        # Users with no relationship to the benchmark user, to send requests to
+        strangers = list(
+            CustomUser.objects.exclude(pk=user.pk)
+            .exclude(pk__in=Friend.objects.friend_ids(user))
+            .exclude(received_friend_requests__from_user=user)
+            .exclude(sent_friend_requests__to_user=user)
+            .order_by("-id")[:10]
+        )
+        if not strangers:
+            raise CommandError("No user left to send friend requests to.")
+        return SimpleNamespace(
+            user=user,
+            friend_count=user.friend_count,
+            pending_ids=pending_ids,
+            stranger=strangers[0],
+            stranger_emails=[stranger.email for stranger in strangers],
+        )
+
+    @staticmethod
+    def route_names(selected):
+        names = [
+            pattern.name
+            for pattern in urls.urlpatterns
+            if isinstance(pattern, URLPattern) and pattern.name
+        ]
+        return [name for name in names if not selected or name in selected]
+
+    def run(self, client, name, spec, iterations):
+        path = reverse(name, kwargs=spec.kwargs)
+
+        def send():
+            if spec.method == "get":
+                return client.get(path, spec.query)
+            return client.post(path, spec.data, format="json")
+
+        # The first request also records queries and their plans
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as captured:
+                response = send()
+            # Later requests reset the query log, copy the statements now
+            statements = [query["sql"] for query in captured]
+            plans = self.analyze(statements)
+            transaction.set_rollback(True)
+
+        samples = []
+        for _ in range(iterations):
+            with transaction.atomic():
+                with timed(samples):
+                    send()
+                transaction.set_rollback(True)
+
+        result = summarize(samples)
+        result.update(status=response.status_code, queries=len(statements), **plans)
+        scanned = (
+            f" rows={result['rows_scanned']}"
+            if result["rows_scanned"] is not None
+            else f" scans={result['full_scans']}"
+        )
+        self.stdout.write(
+            format_summary(name, result)
+            + f" status={result['status']} queries={result['queries']}{scanned}"
+        )
+        return result
+
+    def analyze(self, statements):
+        """
+        Count full table and index scans in the plans of the captured
+        statements, and on PostgreSQL the rows read by scan nodes (from
+        EXPLAIN ANALYZE). SQLite plans carry no row counts.
+        """
+        full_scans = 0
+        rows_scanned = 0 if connection.vendor == "postgresql" else None
+        with connection.cursor() as cursor:
+            for sql in statements:
+                verb = sql.lstrip().split(" ", 1)[0].upper()
+                if connection.vendor == "sqlite" and verb in (
+                    "SELECT",
+                    "UPDATE",
+                    "DELETE",
+                ):
+                    cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                    full_scans += sum(
+                        1
+                        for row in cursor.fetchall()
+                        if row[-1].startswith("SCAN") and "CONSTANT ROW" not in row[-1]
+                    )
+                elif connection.vendor == "postgresql" and verb == "SELECT":
+                    cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")
+                    plan = cursor.fetchone()[0]
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    for node in self.plan_nodes(plan[0]["Plan"]):
+                        if node["Node Type"].endswith("Scan"):
+                            if node["Node Type"] == "Seq Scan":
+                                full_scans += 1
+                            rows_scanned += node["Actual Rows"] * node["Actual Loops"]
+        return {"full_scans": full_scans, "rows_scanned": rows_scanned}
+
+    def plan_nodes(self, node):
+        yield node
+        for child in node.get("Plans", []):
+            yield from self.plan_nodes(child)
+
+    def compare(self, baseline, report, threshold):
+        """
+        Print per-route changes against a baseline, return regressed routes.
+        """
+        regressions = []
+        self.stdout.write(
+            f"\nCompared with the baseline from {baseline['meta']['created_at']}:"
+        )
+        for name, result in report["routes"].items():
+            before = baseline["routes"].get(name)
+            if before is None:
+                self.stdout.write(f"{name:<32} new route")
+                continue
+            change = (
+                (result["p99_ms"] - before["p99_ms"]) / before["p99_ms"] * 100
+                if before["p99_ms"]
+                else 0.0
+            )
+            regressed = change > threshold or result["queries"] > before["queries"]
+            if regressed:
+                regressions.append(name)
+            self.stdout.write(
+                f"{name:<32} p50 {before['p50_ms']:8.3f} -> {result['p50_ms']:8.3f}ms "
+                f"p99 {before['p99_ms']:8.3f} -> {result['p99_ms']:8.3f}ms ({change:+.0f}%) "
+                f"queries {before['queries']} -> {result['queries']}"
+                + ("  REGRESSION" if regressed else "")
+            )
+        return regressions
@@ -0,0 +1,75 @@
+import random
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from social_networking_app.benchmarking import format_summary, summarize, timed
+from social_networking_app.friend_cache import friend_graph
+from social_networking_app.models import CustomUser
+from social_networking_app.paths import get_max_depth, shortest_path
+from social_networking_app.suggestions import load_adjacency
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure shortest friendship path searches between random pairs of "
+        "connected users, by degrees of separation: reading the friendship "
+        "tables, through a cold friend graph cache, and through a warm one. "
+        "Seed graphs of different sizes with generate_social_graph."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pairs", type=int, default=200)
+        parser.add_argument("--max-depth", type=int, default=get_max_depth())
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        user_ids = list(
+            CustomUser.objects.filter(friend_count__gt=0).values_list("pk", flat=True)
+        )
+        if len(user_ids) < 2:
+            raise CommandError("No friendships, run generate_social_graph first.")
+        self.stdout.write(
+            f"{len(user_ids):,} connected users, max depth {options['max_depth']}"
+        )
+
+        rng = random.Random(options["seed"])
+        max_depth = options["max_depth"]
+        samples = defaultdict(list)
+        queries = defaultdict(list)
+        for _ in range(options["pairs"]):
+            source_id, target_id = rng.sample(user_ids, 2)
+            database = []
+            with CaptureQueriesContext(connection) as captured:
+                with timed(database):
+                    path = shortest_path(
+                        source_id, target_id, max_depth, adjacency=load_adjacency
+                    )
+            degrees = len(path) - 1 if path else "none"
+            samples[("database", degrees)] += database
+            queries[degrees].append(len(captured))
+
+            friend_graph.clear()
+            for label in ("cold cache", "warm cache"):
+                with timed(samples[(label, degrees)]):
+                    shortest_path(
+                        source_id, target_id, max_depth, adjacency=friend_graph.get_many
+                    )
+        friend_graph.clear()
+
+        degrees = sorted({key[1] for key in samples}, key=str)
+        for degree in degrees:
+            counts = queries[degree]
+            self.stdout.write(
+                f"degrees={degree}: {len(counts)} pairs, "
+                f"{sum(counts) / len(counts):.1f} queries per search"
+            )
+            for label in ("database", "cold cache", "warm cache"):
+                self.stdout.write(
+                    format_summary(
+                        f"  {label} degrees={degree}",
+                        summarize(samples[(label, degree)]),
+                    )
+                )
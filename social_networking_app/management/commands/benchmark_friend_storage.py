@@ -0,0 +1,95 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.test.utils import override_settings
+
+from social_networking_app.benchmarking import format_summary, summarize, timed
+from social_networking_app.models import CustomUser, Friend, Friendship
+
+STORAGES = (("symmetric", Friend), ("canonical", Friendship))
+
+
+def table_sizes(model):
+    """
+    Return (table bytes, index bytes) of the model's table, or None when the
+    database cannot tell.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT pg_table_size(%s), pg_indexes_size(%s)", [table, table]
+            )
+            return cursor.fetchone()
+        if connection.vendor != "sqlite":
+            return None
+        try:
+            # Needs SQLite built with SQLITE_ENABLE_DBSTAT_VTAB
+            cursor.execute(
+                "SELECT name = %s, SUM(pgsize) FROM dbstat WHERE name = %s OR name IN "
+                "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s) "
+                "GROUP BY name = %s",
+                [table, table, table, table],
+            )
+        except DatabaseError:
+            return None
+        sizes = dict(cursor.fetchall())
+        return sizes.get(1, 0), sizes.get(0, 0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the symmetric (two Friend rows per friendship) and canonical "
+        "(one Friendship row) storages: rows and bytes on disk of each table "
+        "and its indexes, and latency of friend list pages and friend id loads. "
+        "Run it after `migrate_friendships --to canonical` and before pruning, "
+        "so both tables hold the same friendships."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=500)
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        for storage, model in STORAGES:
+            rows = model.objects.count()
+            sizes = table_sizes(model)
+            line = f"{storage:<10} {model._meta.db_table}: {rows:,} rows"
+            if sizes is not None:
+                line += f", table {sizes[0] / 1024:,.0f} KiB, indexes {sizes[1] / 1024:,.0f} KiB"
+            self.stdout.write(line)
+            if not rows:
+                raise CommandError(
+                    f"No {model.__name__} rows, run migrate_friendships first."
+                )
+
+        # The same users for both storages, weighted towards connected ones
+        rng = random.Random(options["seed"])
+        user_ids = list(
+            CustomUser.objects.filter(friend_count__gt=0).values_list("pk", flat=True)
+        )
+        users = [
+            CustomUser(pk=pk) for pk in rng.choices(user_ids, k=options["iterations"])
+        ]
+        page_size = options["page_size"]
+        for storage, _ in STORAGES:
+            samples = {"friend list page": [], "friend list SQL": [], "friend ids": []}
+            with override_settings(FRIENDSHIP_STORAGE=storage):
+                for user in users:
+                    page = Friend.objects.friend_list(user).order_by("id")[:page_size]
+                    sql, params = page.query.sql_with_params()
+                    with timed(samples["friend list page"]):
+                        list(page)
+                    # The database's share, without building the query
+                    with connection.cursor() as cursor:
+                        with timed(samples["friend list SQL"]):
+                            cursor.execute(sql, params)
+                            cursor.fetchall()
+                    with timed(samples["friend ids"]):
+                        Friend.objects.friend_ids(user)
+            for label, timings in samples.items():
+                self.stdout.write(
+                    format_summary(f"{storage} {label}", summarize(timings))
+                )
@@ -0,0 +1,88 @@
+import copy
+import logging
+import logging.config
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from social_networking_app.benchmarking import format_summary, summarize, timed
+from social_networking_app.models import CustomUser
+from social_networking_app.views import FriendViewSet
+
+
+def synchronous_logging(filename):
+    # The previous configuration: everything from Django at DEBUG, written to
+    # the file on the calling thread
+    return {
+        "version": 1,
+        "disable_existing_loggers": False,
+        "handlers": {
+            "file": {
+                "level": "DEBUG",
+                "class": "logging.FileHandler",
+                "filename": filename,
+                "formatter": "verbose",
+            },
+        },
+        "loggers": {
+            "django": {"handlers": ["file"], "level": "DEBUG", "propagate": True},
+        },
+        "formatters": {
+            "verbose": {"format": "%(asctime)s [%(levelname)s] %(module)s %(message)s"}
+        },
+    }
+
+
+def queued_logging(filename):
+    # The configured pipeline, writing to a scratch file
+    config = copy.deepcopy(settings.LOGGING)
+    config["handlers"]["file"]["filename"] = filename
+    return config
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure friend list request latency with the previous synchronous "
+        "file logging and with the configured queued, rate limited logging."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--email", help="User to list friends for.")
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.order_by("id")
+        if options["email"]:
+            users = users.filter(email=options["email"])
+        user = users.first()
+        if user is None:
+            self.stderr.write("No user to send requests as.")
+            return
+
+        view = FriendViewSet.as_view(throttle_classes=[])
+        factory = APIRequestFactory()
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                for label, build_config in (
+                    ("synchronous file handler", synchronous_logging),
+                    ("queued, rate limited", queued_logging),
+                ):
+                    filename = Path(directory) / "benchmark.log"
+                    logging.config.dictConfig(build_config(filename))
+                    samples = []
+                    for _ in range(options["requests"]):
+                        request = factory.get("/friend-list/")
+                        force_authenticate(request, user=user)
+                        with timed(samples):
+                            view(request).render()
+                    logging.shutdown()  # Flush before measuring the file
+                    self.stdout.write(
+                        format_summary(label, summarize(samples))
+                        + f" ({filename.stat().st_size / 1024:,.0f} KiB logged)"
+                    )
+                    filename.unlink()
+        finally:
+            logging.config.dictConfig(settings.LOGGING)
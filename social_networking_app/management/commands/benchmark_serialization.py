@@ -0,0 +1,99 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from social_networking_app.benchmarking import format_summary, summarize, timed
+from social_networking_app.models import CustomUser, Friend, canonical_friendships
+from social_networking_app.renderers import FastJSONRenderer, orjson
+from social_networking_app.serializers import FriendSerializer
+
+
+def serializer_page(user, page_size):
+    # The previous pipeline: model instances through FriendSerializer. Only
+    # symmetric storage has Friend rows to serialize.
+    rows = Friend.objects.filter(user=user).select_related("friend").order_by("id")
+    return FriendSerializer(rows[:page_size], many=True).data
+
+
+def values_page(user, page_size):
+    # The friend list's pipeline: values() rows rendered as they are
+    return list(Friend.objects.friend_list(user).order_by("id")[:page_size])
+
+
+PIPELINES = (
+    ("FriendSerializer + json", serializer_page, JSONRenderer),
+    ("values() + json", values_page, JSONRenderer),
+    ("values() + orjson", values_page, FastJSONRenderer),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows per second of friend list pages built with "
+        "FriendSerializer and with values() rows, rendered with the json "
+        "module and with orjson. Times the query, serialization and rendering."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=1000)
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument(
+            "--email", help="User whose friends to list, defaults to the best connected."
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options["email"])
+        page_size = options["page_size"]
+        rows = user.friend_count
+        if rows < page_size:
+            self.stdout.write(
+                f"{user.email} has {rows} friends, pages are smaller than {page_size}"
+            )
+        rows = min(rows, page_size)
+        self.stdout.write(
+            f"Rendering {rows}-row friend list pages of {user.email}, "
+            f"{options['iterations']} iterations per pipeline"
+        )
+
+        expected = None
+        for label, build_page, renderer_class in PIPELINES:
+            if renderer_class is FastJSONRenderer and orjson is None:
+                self.stdout.write(f"{label:<32} skipped, orjson is not installed")
+                continue
+            if build_page is serializer_page and canonical_friendships():
+                self.stdout.write(f"{label:<32} skipped, friendships are canonical")
+                continue
+            renderer = renderer_class()
+            body = renderer.render(build_page(user, page_size))  # Warm up
+            if expected is None:
+                expected = json.loads(body)
+            elif json.loads(body) != expected:
+                raise CommandError(f"{label} renders different data.")
+
+            samples = []
+            start = time.perf_counter()
+            for _ in range(options["iterations"]):
+                with timed(samples):
+                    renderer.render(build_page(user, page_size))
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                format_summary(label, summarize(samples))
+                + f" {rows * len(samples) / elapsed:,.0f} rows/s"
+            )
+
+    def get_user(self, email):
+        if email:
+            user = CustomUser.objects.filter(email=email).first()
+            if user is None:
+                raise CommandError(f"No user with email {email}.")
+            return user
+        user = (
+            CustomUser.objects.filter(friend_count__gt=0)
+            .order_by("-friend_count")
+            .first()
+        )
+        if user is None:
+            raise CommandError("No friendships, run generate_social_graph first.")
+        return user
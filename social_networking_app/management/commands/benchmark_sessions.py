@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from social_networking_app.benchmarking import format_summary, summarize, timed
+from social_networking_app.management.commands.benchmark_endpoints import (
+    NO_THROTTLE_STORE,
+)
+from social_networking_app.models import CustomUser
+
+SESSION_BACKENDS = ("db", "cached_db", "signed_cookies")
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure queries and latency per /friend-list/ request of a session "
+        "logged in user, for each session backend with and without the "
+        "cached user loader."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--email", help="User to log in as, defaults to the best connected."
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options["email"])
+        path = reverse("friend-list")
+        self.stdout.write(
+            f"GET {path} as {user.email}, {options['requests']} requests per mode"
+        )
+        for backend in SESSION_BACKENDS:
+            for timeout in (0, 300):
+                with override_settings(
+                    SESSION_ENGINE=f"django.contrib.sessions.backends.{backend}",
+                    USER_CACHE_TIMEOUT=timeout,
+                    THROTTLE_STORE=NO_THROTTLE_STORE,
+                ):
+                    client = Client()  # Loads the session engine
+                    client.force_login(user)
+                    client.get(path)  # Warm the caches
+                    samples = []
+                    with CaptureQueriesContext(connection) as captured:
+                        for _ in range(options["requests"]):
+                            with timed(samples):
+                                response = client.get(path)
+                    client.logout()
+                if response.status_code != 200:
+                    raise CommandError(f"{path} answered {response.status_code}.")
+                label = f"{backend}, user cache {'on' if timeout else 'off'}"
+                self.stdout.write(
+                    format_summary(label, summarize(samples))
+                    + f" queries={len(captured) / len(samples):.1f}"
+                )
+
+    def get_user(self, email):
+        if email:
+            user = CustomUser.objects.filter(email=email).first()
+            if user is None:
+                raise CommandError(f"No user with email {email}.")
+            return user
+        user = CustomUser.objects.order_by("-friend_count", "id").first()
+        if user is None:
+            raise CommandError("No users, run generate_social_graph first.")
+        return user
@@ -0,0 +1,80 @@
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from rest_framework.throttling import UserRateThrottle
+
+from social_networking_app.benchmarking import format_summary, summarize, timed
+from social_networking_app.throttle_stores import (
+    CacheCounterStore,
+    SQLiteCounterStore,
+)
+from social_networking_app.throttles import SlidingWindowRateThrottle
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the per-check cost of DRF's timestamp-list throttle with the "
+        "sliding-window counter throttle on each counter store."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--checks", type=int, default=5000)
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument(
+            "--rate",
+            default="100000/hour",
+            help="High enough that no check is rejected and histories keep growing.",
+        )
+
+    def handle(self, *args, **options):
+        rate = options["rate"]
+        requests = [
+            SimpleNamespace(user=SimpleNamespace(is_authenticated=True, pk=pk), META={})
+            for pk in range(options["users"])
+        ]
+
+        class ListThrottle(UserRateThrottle):
+            scope = "benchmark"
+
+            def get_rate(self):
+                return rate
+
+        class WindowThrottle(SlidingWindowRateThrottle):
+            scope = "benchmark"
+            store = None
+
+            def get_rate(self):
+                return rate
+
+            def get_store(self):
+                return self.store
+
+        with tempfile.TemporaryDirectory() as directory:
+            stores = {
+                "sliding window (cache)": CacheCounterStore(),
+                "sliding window (sqlite)": SQLiteCounterStore(
+                    Path(directory) / "throttle.sqlite3"
+                ),
+            }
+            self.run("timestamp list (cache)", ListThrottle, requests, options)
+            for label, store in stores.items():
+                WindowThrottle.store = store
+                self.run(label, WindowThrottle, requests, options)
+
+    def run(self, label, throttle_class, requests, options):
+        cache.clear()
+        samples = []
+        start = time.perf_counter()
+        for i in range(options["checks"]):
+            request = requests[i % len(requests)]
+            with timed(samples):
+                throttle_class().allow_request(request, None)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            format_summary(label, summarize(samples))
+            + f" ({options['checks'] / elapsed:,.0f} checks/s)"
+        )
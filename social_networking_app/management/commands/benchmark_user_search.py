@@ -0,0 +1,114 @@
+import random
+import string
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from social_networking_app.benchmarking import format_summary, summarize, timed
+from social_networking_app.management.commands.benchmark_endpoints import (
+    NO_THROTTLE_STORE,
+)
+from social_networking_app.models import CustomUser
+from social_networking_app.search import index_users
+
+
+def random_name(rng, length):
+    # Build a pronounceable-enough random identifier
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure user search latency through the /user-search/ endpoint, "
+        "including the page count, optionally seeding synthetic users first. "
+        "Queries are selective (exact email, prefix, substring) and broad "
+        "(the domain, its name and its top-level domain)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed-users",
+            type=int,
+            default=0,
+            help="Number of synthetic users to create before measuring.",
+        )
+        parser.add_argument("--queries", type=int, default=1000)
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        if options["seed_users"]:
+            self.seed_users(rng, options["seed_users"], options["batch_size"])
+
+        emails = list(
+            CustomUser.objects.order_by("?").values_list("email", flat=True)[:1000]
+        )
+        if not emails:
+            self.stderr.write("No users to search, use --seed-users.")
+            return
+
+        client = APIClient()
+        client.force_authenticate(user=CustomUser.objects.first())
+        path = reverse("user-search")
+        page_size = options["page_size"]
+        samples = {}
+        queries = {}
+        with override_settings(THROTTLE_STORE=NO_THROTTLE_STORE):
+            for _ in range(options["queries"]):
+                email = rng.choice(emails)
+                local, domain = email.split("@")
+                start = rng.randrange(max(1, len(local) - 3))
+                terms = {
+                    "exact email": email,
+                    "prefix": local[: rng.randint(1, min(4, len(local)))],
+                    "substring": local[start : start + 4],
+                    "domain": domain,
+                    "domain name": domain.split(".")[0],
+                    "top-level domain": domain.rsplit(".", 1)[-1],
+                }
+                for kind, term in terms.items():
+                    with CaptureQueriesContext(connection) as captured:
+                        with timed(samples.setdefault(kind, [])):
+                            response = client.get(
+                                path, {"q": term, "page_size": page_size}
+                            )
+                    if response.status_code != 200:
+                        raise CommandError(
+                            f"Searching {term!r} answered {response.status_code}."
+                        )
+                    queries[kind] = len(captured)
+
+        self.stdout.write(f"{CustomUser.objects.count():,} users")
+        for kind, kind_samples in samples.items():
+            self.stdout.write(
+                format_summary(kind, summarize(kind_samples))
+                + f" queries={queries[kind]}"
+            )
+
+    def seed_users(self, rng, count, batch_size):
+        # Insert synthetic users in batches and index them in bulk
+        password = make_password(None)
+        offset = CustomUser.objects.count()
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            users = CustomUser.objects.bulk_create(
+                [
+                    CustomUser(
+                        email=f"{random_name(rng, 8)}.{offset + created + i}@example.com",
+                        username=random_name(rng, 10),
+                        password=password,
+                    )
+                    for i in range(size)
+                ],
+                batch_size=batch_size,
+            )
+            index_users(users)
+            created += size
+            self.stdout.write(f"Seeded {created}/{count} users")
@@ -0,0 +1,70 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from social_networking_app.models import FriendshipEvent
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete friend list change feed entries older than "
+        "FRIENDSHIP_EVENT_RETENTION_DAYS, in short transactions over "
+        "consecutive id ranges. Clients whose cursor predates the remaining "
+        "entries get a 410 from /friend-list/changes/ and download the list "
+        "again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Retention in days, defaults to FRIENDSHIP_EVENT_RETENTION_DAYS.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        if days is None:
+            days = settings.FRIENDSHIP_EVENT_RETENTION_DAYS
+        if days <= 0:
+            raise CommandError("Pass a retention of at least one day.")
+        # Only a prefix of ids is removed, so the feed's first remaining id
+        # tells which cursors still have all their changes. The newest entry
+        # is always kept.
+        cutoff = timezone.now() - timedelta(days=days)
+        bounds = FriendshipEvent.objects.aggregate(
+            newest=Max("id"), upper=Max("id", filter=Q(created_at__lt=cutoff))
+        )
+        upper = bounds["upper"]
+        if upper is not None and upper == bounds["newest"]:
+            upper -= 1
+        if not upper:
+            self.stdout.write(f"No change feed entries older than {days} days.")
+            return
+        old = FriendshipEvent.objects.filter(id__lte=upper)
+
+        start = time.perf_counter()
+        deleted = 0
+        last_id = 0
+        while True:
+            ids = list(
+                old.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[: options["batch_size"]]
+            )
+            if not ids:
+                break
+            deleted += old.filter(pk__range=(ids[0], ids[-1])).delete()[0]
+            last_id = ids[-1]
+            self.stdout.write(f"Deleted {deleted:,} entries up to id {last_id}")
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {deleted:,} change feed entries older than {days} days "
+                f"in {elapsed:.1f}s ({deleted / max(elapsed, 1e-9):,.0f} rows/s)."
+            )
+        )
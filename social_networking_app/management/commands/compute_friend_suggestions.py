@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from social_networking_app.suggestions import compute_all_suggestions, get_top_k
+
+
+class Command(BaseCommand):
+    help = "Recompute the friend-of-friend suggestions of every user."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--top-k", type=int, default=None)
+
+    def handle(self, *args, **options):
+        top_k = options["top_k"] or get_top_k()
+        start = time.perf_counter()
+        stored_total = 0
+        for processed, stored in compute_all_suggestions(options["batch_size"], top_k):
+            stored_total += stored
+            self.stdout.write(f"Processed {processed} users ({stored_total} suggestions)")
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stored {stored_total} suggestions (top {top_k}) in {elapsed:.1f}s."
+            )
+        )
@@ -0,0 +1,135 @@
+import random
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from social_networking_app.benchmarking import percentile
+from social_networking_app.models import CustomUser, Friend, FriendRequest
+from social_networking_app.search import index_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a reproducible synthetic social graph: users, friendships "
+        "with a power-law degree distribution and pending friend requests."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument(
+            "--avg-friends", type=float, default=20, help="Mean friend count."
+        )
+        parser.add_argument(
+            "--exponent",
+            type=float,
+            default=2.5,
+            help="Power-law exponent of the degree distribution (> 2).",
+        )
+        parser.add_argument(
+            "--pending", type=float, default=2, help="Mean pending requests per user."
+        )
+        parser.add_argument("--prefix", default="graph")
+        parser.add_argument("--password", default="password")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Delete users generated earlier with the same prefix first.",
+        )
+
+    def handle(self, *args, **options):
+        if options["exponent"] <= 2:
+            raise CommandError("--exponent must be greater than 2.")
+        prefix = options["prefix"]
+        generated = CustomUser.objects.filter(email__startswith=f"{prefix}.")
+        if options["reset"]:
+            deleted, _ = generated.delete()
+            self.stdout.write(f"Deleted {deleted} rows from an earlier graph")
+        elif generated.exists():
+            raise CommandError(
+                f"Users with the prefix {prefix!r} exist, use --reset or --prefix."
+            )
+
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+        user_ids = self.create_users(options["users"], prefix, options, batch_size)
+
+        # Chung-Lu model: endpoints are drawn with weights following a power
+        # law, so expected degrees follow it too
+        weights = [
+            (rank + 1) ** (-1 / (options["exponent"] - 1))
+            for rank in range(len(user_ids))
+        ]
+        cum_weights = list(accumulate(weights))
+        friend_count = int(len(user_ids) * options["avg_friends"] / 2)
+        friendships = self.sample_pairs(rng, user_ids, cum_weights, friend_count)
+        pairs = list(friendships.values())
+        for start in range(0, len(pairs), batch_size):
+            # The sampled pairs are distinct and the users are new
+            Friend.objects.create_friendships(
+                pairs[start : start + batch_size], new_only=True
+            )
+        self.stdout.write(f"Created {len(pairs)} friendships")
+
+        pending_count = int(len(user_ids) * options["pending"])
+        pending = self.sample_pairs(
+            rng, user_ids, cum_weights, pending_count, exclude=friendships
+        )
+        created = FriendRequest.objects.send(pending.values(), batch_size=batch_size)
+        self.stdout.write(f"Created {len(created)} pending friend requests")
+        self.report_degrees(user_ids, pairs)
+
+    def create_users(self, count, prefix, options, batch_size):
+        password = make_password(options["password"])
+        user_ids = []
+        for start in range(0, count, batch_size):
+            with transaction.atomic():
+                users = CustomUser.objects.bulk_create(
+                    [
+                        CustomUser(
+                            email=f"{prefix}.{i}@example.com",
+                            username=f"{prefix}_{i}",
+                            password=password,
+                        )
+                        for i in range(start, min(start + batch_size, count))
+                    ]
+                )
+                index_users(users)
+            user_ids.extend(user.pk for user in users)
+            self.stdout.write(f"Created {len(user_ids)}/{count} users")
+        return user_ids
+
+    @staticmethod
+    def sample_pairs(rng, user_ids, cum_weights, count, exclude=()):
+        """
+        Draw up to ``count`` pairs of different users, as a dict keyed by the
+        (low, high) ids so no two pairs, or a pair in ``exclude``, connect the
+        same users.
+        """
+        pairs = {}
+        attempts = 0
+        while len(pairs) < count and attempts < count * 10:
+            needed = count - len(pairs)
+            attempts += needed
+            sources = rng.choices(user_ids, cum_weights=cum_weights, k=needed)
+            targets = rng.choices(user_ids, cum_weights=cum_weights, k=needed)
+            for a, b in zip(sources, targets):
+                key = (min(a, b), max(a, b))
+                if a != b and key not in pairs and key not in exclude:
+                    pairs[key] = (a, b)
+        return pairs
+
+    def report_degrees(self, user_ids, pairs):
+        degrees = dict.fromkeys(user_ids, 0)
+        for a, b in pairs:
+            degrees[a] += 1
+            degrees[b] += 1
+        values = list(degrees.values())
+        self.stdout.write(
+            f"Friend degree: mean={sum(values) / len(values):.1f} "
+            f"p50={percentile(values, 50)} p99={percentile(values, 99)} "
+            f"max={max(values)}"
+        )
@@ -0,0 +1,273 @@
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, nullcontext
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import get_hasher, identify_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from social_networking_app.models import CustomUser, Friend
+from social_networking_app.search import index_users
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+FORMATS = ("csv", "jsonl")
+
+
+def read_records(path, fmt):
+    """
+    Yield one dict per CSV row or JSON line of the file ("-" for stdin).
+    """
+    with ExitStack() as stack:
+        if path == "-":
+            stream = sys.stdin
+        else:
+            stream = stack.enter_context(open(path, newline="", encoding="utf-8"))
+        if fmt == "csv":
+            yield from csv.DictReader(stream)
+        else:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def setup_worker():
+    # Spawned (not forked) workers need Django configured to hash passwords
+    django.setup()
+
+
+def hash_passwords(passwords, hasher):
+    return [make_password(password, hasher=hasher) for password in passwords]
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream users and friendships from CSV or JSONL files into the "
+        "database. Users have an email and optionally a username and a "
+        "password (hashed in a process pool) or a pre-hashed password_hash. "
+        "Friendships have email and friend_email columns and are created in "
+        "both directions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", help="Users file, '-' for stdin.")
+        parser.add_argument("--friendships", help="Friendships file, '-' for stdin.")
+        parser.add_argument(
+            "--format", choices=FORMATS, help="Defaults to the file extension."
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Password hashing processes, 0 hashes in this process.",
+        )
+        parser.add_argument(
+            "--hasher",
+            default="default",
+            help="Name of a hasher in PASSWORD_HASHERS used for plain passwords.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["users"] and not options["friendships"]:
+            raise CommandError("Pass --users and/or --friendships.")
+        try:
+            get_hasher(options["hasher"])
+        except ValueError as exc:
+            raise CommandError(exc)
+        if options["users"]:
+            self.import_users(options["users"], options)
+        if options["friendships"]:
+            self.import_friendships(options["friendships"], options)
+        if resource is not None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.stdout.write(f"Peak memory: {peak / 1024:,.0f} MiB")
+
+    def get_format(self, path, options):
+        fmt = options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+        if fmt == "ndjson":
+            fmt = "jsonl"
+        if fmt not in FORMATS:
+            raise CommandError(f"Cannot tell the format of {path}, use --format.")
+        return fmt
+
+    @staticmethod
+    def normalize(email):
+        # The same normalization as CustomUserManager.create_user
+        return CustomUser.objects.normalize_email((email or "").strip())
+
+    @staticmethod
+    def valid_hash(encoded):
+        if not encoded:
+            return True
+        try:
+            identify_hasher(encoded)
+        except ValueError:
+            return False
+        return True
+
+    def import_users(self, path, options):
+        records = read_records(path, self.get_format(path, options))
+        workers = options["workers"]
+        progress = Progress(self, "users")
+        with (
+            ProcessPoolExecutor(workers, initializer=setup_worker)
+            if workers
+            else nullcontext()
+        ) as executor:
+            # Hash the next batch while the current one is inserted
+            pending = deque()
+            for batch in batched(records, options["batch_size"]):
+                pending.append(self.hash_batch(executor, batch, options))
+                if len(pending) > 1:
+                    progress.update(*self.insert_users(*pending.popleft()))
+            while pending:
+                progress.update(*self.insert_users(*pending.popleft()))
+        progress.done()
+
+    def hash_batch(self, executor, batch, options):
+        """
+        Start hashing the plain passwords of a batch, return the batch and
+        the pending hashes as (row indexes, future or list) pairs.
+        """
+        indexes = [
+            i
+            for i, record in enumerate(batch)
+            if record.get("password") and not record.get("password_hash")
+        ]
+        passwords = [batch[i]["password"] for i in indexes]
+        if executor is None:
+            return batch, [(indexes, hash_passwords(passwords, options["hasher"]))]
+        # One task per worker keeps inter-process messages few
+        size = -(-len(indexes) // options["workers"]) or 1
+        chunks = []
+        for start in range(0, len(indexes), size):
+            future = executor.submit(
+                hash_passwords, passwords[start : start + size], options["hasher"]
+            )
+            chunks.append((indexes[start : start + size], future))
+        return batch, chunks
+
+    def insert_users(self, batch, chunks):
+        hashes = {}
+        for indexes, result in chunks:
+            if not isinstance(result, list):
+                result = result.result()
+            hashes.update(zip(indexes, result))
+
+        users = {}
+        invalid = 0
+        for i, record in enumerate(batch):
+            email = self.normalize(record.get("email"))
+            if not email or not self.valid_hash(record.get("password_hash")):
+                invalid += 1
+                continue
+            password = (
+                record.get("password_hash") or hashes.get(i) or make_password(None)
+            )
+            users.setdefault(
+                email,
+                CustomUser(
+                    email=email,
+                    username=record.get("username") or None,
+                    password=password,
+                ),
+            )
+        with transaction.atomic():
+            existing = set(
+                CustomUser.objects.filter(email__in=users).values_list(
+                    "email", flat=True
+                )
+            )
+            created = CustomUser.objects.bulk_create(
+                [user for email, user in users.items() if email not in existing]
+            )
+            index_users(created)
+        return len(batch), len(created), len(batch) - len(created) - invalid, invalid
+
+    def import_friendships(self, path, options):
+        records = read_records(path, self.get_format(path, options))
+        progress = Progress(self, "friendships")
+        for batch in batched(records, options["batch_size"]):
+            progress.update(*self.insert_friendships(batch))
+        progress.done()
+
+    def insert_friendships(self, batch):
+        # Resolve the emails of this batch only, memory stays bounded
+        rows = [
+            (
+                self.normalize(record.get("email")),
+                self.normalize(record.get("friend_email")),
+            )
+            for record in batch
+        ]
+        emails = {email for row in rows for email in row if email}
+        ids = dict(
+            CustomUser.objects.filter(email__in=emails).values_list("email", "id")
+        )
+        pairs = set()
+        invalid = 0
+        for email, friend_email in rows:
+            user_id = ids.get(email)
+            friend_id = ids.get(friend_email)
+            if user_id is None or friend_id is None or user_id == friend_id:
+                invalid += 1
+                continue
+            pairs.add((min(user_id, friend_id), max(user_id, friend_id)))
+        with transaction.atomic():
+            # Both directions are always stored, so checking one is enough.
+            # Filtering on both columns in SQL would probe every combination
+            # of the two id lists.
+            existing = Friend.objects.friend_pairs({a for a, _ in pairs})
+            new_pairs = sorted(pairs.difference(existing.iterator(chunk_size=5000)))
+            Friend.objects.create_friendships(new_pairs, new_only=True)
+        skipped = len(batch) - len(new_pairs) - invalid
+        return len(batch), len(new_pairs), skipped, invalid
+
+
+class Progress:
+    """
+    Running totals of an import, reported after every batch.
+    """
+
+    def __init__(self, command, label):
+        self.command = command
+        self.label = label
+        self.start = time.perf_counter()
+        self.rows = self.created = self.skipped = self.invalid = 0
+
+    def update(self, rows, created, skipped, invalid):
+        self.rows += rows
+        self.created += created
+        self.skipped += skipped
+        self.invalid += invalid
+        self.command.stdout.write(
+            f"{self.label}: {self.rows:,} rows ({self.rate():,.0f} rows/s)"
+        )
+
+    def rate(self):
+        return self.rows / max(time.perf_counter() - self.start, 1e-9)
+
+    def done(self):
+        self.command.stdout.write(
+            f"Imported {self.label}: {self.created:,} written, "
+            f"{self.skipped:,} already present or repeated, {self.invalid:,} invalid, "
+            f"{self.rows:,} rows in {time.perf_counter() - self.start:.1f}s "
+            f"({self.rate():,.0f} rows/s)"
+        )
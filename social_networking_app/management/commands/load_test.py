@@ -0,0 +1,97 @@
+import http.client
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from social_networking_app.benchmarking import format_summary, summarize, timed
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test a running server with concurrent keep-alive clients and "
+        "report throughput and latency percentiles. Run it against the same "
+        "worker count served over WSGI and ASGI, e.g. /friend-list/ vs "
+        "/async/friend-list/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://localhost:8000")
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Path to request, may be repeated. Requests cycle through them.",
+        )
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument(
+            "--header",
+            action="append",
+            dest="headers",
+            default=[],
+            help="Extra 'Name: value' header, e.g. 'Authorization: Token <key>'.",
+        )
+        parser.add_argument("--timeout", type=float, default=30)
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme not in ("http", "https"):
+            raise CommandError("--url must be an http(s) URL.")
+        paths = options["paths"] or ["/async/friend-list/?pagination=cursor"]
+        headers = {}
+        for header in options["headers"]:
+            name, sep, value = header.partition(":")
+            if not sep:
+                raise CommandError(f"Invalid header {header!r}.")
+            headers[name.strip()] = value.strip()
+
+        connection_class = (
+            http.client.HTTPSConnection
+            if url.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        local = threading.local()
+        samples = []
+        statuses = Counter()
+        lock = threading.Lock()
+
+        def send(i):
+            # Each client thread keeps one connection open across requests
+            connection = getattr(local, "connection", None)
+            if connection is None:
+                connection = local.connection = connection_class(
+                    url.netloc, timeout=options["timeout"]
+                )
+            thread_samples = []
+            try:
+                with timed(thread_samples):
+                    connection.request("GET", paths[i % len(paths)], headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException) as exc:
+                connection.close()
+                local.connection = None
+                status = type(exc).__name__
+            with lock:
+                samples.extend(thread_samples)
+                statuses[status] += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            list(executor.map(send, range(options["requests"])))
+        elapsed = time.perf_counter() - start
+
+        label = f"{url.netloc} c={options['concurrency']}"
+        self.stdout.write(
+            format_summary(label, summarize(samples))
+            + f" ({options['requests'] / elapsed:,.0f} req/s)"
+        )
+        self.stdout.write(
+            "status codes: "
+            + ", ".join(f"{status}={count}" for status, count in statuses.items())
+        )
@@ -0,0 +1,145 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Greatest, Least
+
+from social_networking_app.models import (
+    Friend,
+    Friendship,
+    canonical_rows,
+    dual_write_friendships,
+    symmetric_rows,
+)
+
+STORAGES = ("canonical", "symmetric")
+
+
+class Command(BaseCommand):
+    help = (
+        "Move friendships between the symmetric Friend table (two rows per "
+        "friendship) and the canonical Friendship table (one row) in batches. "
+        "Turn FRIENDSHIP_DUAL_WRITE on, copy, switch FRIENDSHIP_STORAGE, turn "
+        "FRIENDSHIP_DUAL_WRITE off, then --prune the old rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--to", choices=STORAGES, required=True)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Delete the rows of the old table once FRIENDSHIP_STORAGE is the "
+            "target and FRIENDSHIP_DUAL_WRITE is off.",
+        )
+
+    def handle(self, *args, **options):
+        target = options["to"]
+        batch_size = options["batch_size"]
+        if options["prune"]:
+            self.prune(target, batch_size)
+            return
+        if settings.FRIENDSHIP_STORAGE == target:
+            raise CommandError(
+                f"FRIENDSHIP_STORAGE is already {target!r}, copy before switching."
+            )
+        if not dual_write_friendships():
+            raise CommandError(
+                "Turn FRIENDSHIP_DUAL_WRITE on before copying, so friendships "
+                "created and deleted meanwhile reach both tables."
+            )
+        to_canonical = target == "canonical"
+
+        copied = 0
+        for rows in self.batches(not to_canonical, batch_size):
+            with transaction.atomic():
+                self.insert(to_canonical, rows)
+            # A friendship deleted since the batch was read was copied back,
+            # its dual-written delete found nothing to delete yet
+            self.delete_missing(to_canonical, rows)
+            copied += len(rows)
+            self.stdout.write(f"Copied {copied} rows (last id {rows[-1][0]})")
+
+        # Friendships deleted before FRIENDSHIP_DUAL_WRITE was on, e.g. since
+        # an earlier copy. The target rows are read before the source ones, so
+        # a friendship created meanwhile is in neither or in both.
+        deleted = 0
+        for rows in self.batches(to_canonical, batch_size):
+            deleted += self.delete_missing(to_canonical, rows)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Copied {copied} rows to {target} storage, deleted {deleted} "
+                "friendships missing from the old storage."
+            )
+        )
+
+    def prune(self, target, batch_size):
+        if settings.FRIENDSHIP_STORAGE != target:
+            raise CommandError(
+                f"FRIENDSHIP_STORAGE is {settings.FRIENDSHIP_STORAGE!r}, switch it "
+                f"to {target!r} before pruning the old rows."
+            )
+        if dual_write_friendships():
+            raise CommandError(
+                "Turn FRIENDSHIP_DUAL_WRITE off before pruning, or the old rows "
+                "keep being written."
+            )
+        old = Friend if target == "canonical" else Friendship
+        deleted = 0
+        for rows in self.batches(target != "canonical", batch_size):
+            # The old storage's delete signals are no-ops, counters stay
+            deleted += old.objects.filter(pk__in=[row[0] for row in rows]).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} {old.__name__} rows."))
+
+    @staticmethod
+    def batches(canonical, batch_size):
+        # (id, low, high, created_at) of the rows of one storage, walked by
+        # primary key so each batch is an index range scan. A symmetric
+        # friendship may only have one of its two rows, both directions count.
+        if canonical:
+            queryset = Friendship.objects.values_list(
+                "pk", "low_id", "high_id", "created_at"
+            )
+        else:
+            queryset = Friend.objects.values_list(
+                "pk",
+                Least("user_id", "friend_id"),
+                Greatest("user_id", "friend_id"),
+                "created_at",
+            )
+        last_id = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_id).order_by("pk")[:batch_size])
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    @staticmethod
+    def insert(to_canonical, rows):
+        pairs = [(low, high) for _, low, high, _ in rows]
+        created_at = [created_at for *_, created_at in rows]
+        if to_canonical:
+            friends = canonical_rows(pairs)
+        else:
+            # Two rows per pair, in the order of the pairs
+            friends = symmetric_rows(pairs)
+            created_at = [value for value in created_at for _ in range(2)]
+        for friend, value in zip(friends, created_at):
+            friend.created_at = value
+        model = Friendship if to_canonical else Friend
+        model.objects.bulk_create(friends, ignore_conflicts=True)
+
+    @staticmethod
+    def delete_missing(to_canonical, rows):
+        # Delete the target rows of the pairs that the source no longer holds
+        pairs = {(low, high) for _, low, high, _ in rows}
+        missing = pairs - set(
+            Friend.objects.stored_pairs(pairs, canonical=not to_canonical).values()
+        )
+        if not missing:
+            return 0
+        model = Friendship if to_canonical else Friend
+        ids = Friend.objects.stored_pairs(missing, canonical=to_canonical)
+        # The target's delete signals are no-ops, counters stay
+        model.objects.filter(pk__in=ids).delete()
+        return len(missing)
@@ -0,0 +1,85 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from social_networking_app.models import FriendRequest
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive (or delete) pending friend requests older than "
+        "FRIEND_REQUEST_TTL_DAYS. Works through the requests in short "
+        "transactions over consecutive id ranges, so it never holds locks for "
+        "long and can be stopped and run again at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, help="TTL in days, defaults to FRIEND_REQUEST_TTL_DAYS."
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Delete expired requests instead of archiving them.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to pause between batches, to leave room for other writers.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Count expired requests only."
+        )
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        if days is None:
+            days = settings.FRIEND_REQUEST_TTL_DAYS
+        if days <= 0:
+            raise CommandError("The friend request TTL is disabled, pass --days.")
+        # The cutoff is fixed for the whole run, so it ends even under new writes
+        expired = FriendRequest.objects.expired(days)
+        if options["dry_run"]:
+            self.stdout.write(
+                f"{expired.count():,} pending requests are older than {days} days"
+            )
+            return
+
+        action = "Deleted" if options["delete"] else "Archived"
+        batch_size = options["batch_size"]
+        start = time.perf_counter()
+        processed = 0
+        last_id = 0
+        while True:
+            # The next id range holding batch_size expired requests
+            ids = list(
+                expired.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            batch_start = time.perf_counter()
+            moved = expired.filter(pk__range=(ids[0], ids[-1])).archive(
+                keep=not options["delete"]
+            )
+            processed += len(moved)
+            last_id = ids[-1]
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{action} {processed:,} requests up to id {last_id} "
+                f"(batch {(time.perf_counter() - batch_start) * 1000:.0f}ms, "
+                f"{processed / max(elapsed, 1e-9):,.0f} rows/s)"
+            )
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{action} {processed:,} pending requests older than {days} days "
+                f"in {elapsed:.1f}s ({processed / max(elapsed, 1e-9):,.0f} rows/s)."
+            )
+        )
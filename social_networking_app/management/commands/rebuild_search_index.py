@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from social_networking_app.models import CustomUser
+from social_networking_app.search import index_users
+
+
+class Command(BaseCommand):
+    help = "Rebuild the user search token index in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = 0
+        indexed = 0
+        while True:
+            # Walk the users by primary key so each batch is an index range scan
+            batch = list(
+                CustomUser.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .only("pk", "email", "username")[:batch_size]
+            )
+            if not batch:
+                break
+            index_users(batch)
+            indexed += len(batch)
+            last_id = batch[-1].pk
+            self.stdout.write(f"Indexed {indexed} users (last id {last_id})")
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt for {indexed} users."))
@@ -0,0 +1,109 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from social_networking_app.models import (
+    CustomUser,
+    Friend,
+    FriendRequest,
+    Friendship,
+    canonical_friendships,
+    users_updated,
+)
+
+
+def counted(rows, column):
+    # Correlated COUNT(*) of the rows pointing at the outer user, 0 if none
+    counts = (
+        rows.filter(**{column: OuterRef("pk")})
+        .order_by()
+        .values(column)
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def actual_counts():
+    if canonical_friendships():
+        friends = counted(Friendship.objects.all(), "low") + counted(
+            Friendship.objects.all(), "high"
+        )
+    else:
+        friends = counted(Friend.objects.all(), "user")
+    return {
+        "friend_count": friends,
+        "pending_request_count": counted(
+            FriendRequest.objects.filter(accepted=False), "to_user"
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the friend and pending request counters of every user in "
+        "batches and fix the ones that drifted from the friendship and "
+        "friend request rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Report drift without fixing it."
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = 0
+        checked = 0
+        drifted = 0
+        while True:
+            # Walk the users by primary key so each batch is an index range scan
+            ids = list(
+                CustomUser.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            checked += len(ids)
+            last_id = ids[-1]
+            drifted += self.reconcile(ids, options["dry_run"])
+        action = "Found" if options["dry_run"] else "Fixed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{action} {drifted} drifted users out of {checked} checked."
+            )
+        )
+
+    def reconcile(self, ids, dry_run):
+        with transaction.atomic():
+            counts = actual_counts()
+            users = CustomUser.objects.filter(pk__in=ids).annotate(
+                **{f"actual_{field}": count for field, count in counts.items()}
+            )
+            rows = list(
+                users.filter(
+                    ~Q(friend_count=F("actual_friend_count"))
+                    | ~Q(pending_request_count=F("actual_pending_request_count"))
+                ).values_list(
+                    "pk",
+                    "friend_count",
+                    "actual_friend_count",
+                    "pending_request_count",
+                    "actual_pending_request_count",
+                )
+            )
+            for pk, friends, actual_friends, pending, actual_pending in rows:
+                self.stdout.write(
+                    f"User {pk}: friends {friends} -> {actual_friends}, "
+                    f"pending requests {pending} -> {actual_pending}"
+                )
+            drifted = {pk for pk, *_ in rows}
+            if drifted and not dry_run:
+                CustomUser.objects.filter(pk__in=drifted).update(**counts)
+                transaction.on_commit(
+                    lambda: users_updated.send(sender=CustomUser, user_ids=drifted)
+                )
+        return len(drifted)
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.3 on 2026-10-17 19:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("social_networking_app", "0002_user_search_token"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="friendrequest",
+            index=models.Index(
+                fields=["to_user", "accepted", "created_at", "id"],
+                name="friendrequest_inbox_idx",
+            ),
+        ),
+    ]
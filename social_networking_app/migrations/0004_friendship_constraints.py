@@ -0,0 +1,43 @@
+# Generated by Django 5.0.3 on 2026-10-17 20:00
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicates(apps, schema_editor):
+    # Keep the oldest row of each duplicated pair so the unique constraints
+    # can be created
+    for model_name, fields in (
+        ("Friend", ("user", "friend")),
+        ("FriendRequest", ("from_user", "to_user")),
+    ):
+        model = apps.get_model("social_networking_app", model_name)
+        keep_ids = model.objects.values(*fields).annotate(keep_id=Min("id"))
+        model.objects.exclude(id__in=keep_ids.values("keep_id")).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("social_networking_app", "0003_friend_request_inbox_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="friend",
+            index=models.Index(fields=["user", "id"], name="friend_list_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="friend",
+            constraint=models.UniqueConstraint(
+                fields=("user", "friend"), name="unique_friend"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="friendrequest",
+            constraint=models.UniqueConstraint(
+                fields=("from_user", "to_user"), name="unique_friend_request"
+            ),
+        ),
+    ]
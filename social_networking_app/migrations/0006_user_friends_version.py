@@ -0,0 +1,23 @@
+# Generated by Django 5.0.3 on 2026-10-17 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("social_networking_app", "0005_friend_suggestion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="friends_changed_at",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="friends_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.3 on 2026-10-17 20:53
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    # One UPDATE per counter, reconcile_counters does the same in batches
+    CustomUser = apps.get_model("social_networking_app", "CustomUser")
+    Friend = apps.get_model("social_networking_app", "Friend")
+    FriendRequest = apps.get_model("social_networking_app", "FriendRequest")
+    for field, rows, column in (
+        ("friend_count", Friend.objects.all(), "user"),
+        (
+            "pending_request_count",
+            FriendRequest.objects.filter(accepted=False),
+            "to_user",
+        ),
+    ):
+        counts = (
+            rows.filter(**{column: OuterRef("pk")})
+            .order_by()
+            .values(column)
+            .annotate(n=Count("pk"))
+            .values("n")
+        )
+        CustomUser.objects.update(**{field: Coalesce(Subquery(counts), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("social_networking_app", "0006_user_friends_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="friend_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="pending_request_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.0.3 on 2026-10-17 21:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("social_networking_app", "0009_archived_friend_request"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FriendshipEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("other_id", models.BigIntegerField()),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("friend_added", "Friend added"),
+                            ("friend_removed", "Friend removed"),
+                            ("request_received", "Request received"),
+                            ("request_rejected", "Request rejected"),
+                            ("request_expired", "Request expired"),
+                            ("request_cancelled", "Request cancelled"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "id"], name="friendship_event_feed_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,5 +1,23 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import DEFERRED, Case, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+from django.dispatch import Signal
+
+# Sent once the transaction creating friendships has committed, with
+# pairs=[(user_id, friend_id), ...] holding one pair per friendship
+friendships_created = Signal()
+# Sent once a transaction changing user rows with update() (friends versions
+# and counters) has committed, with user_ids holding the changed users
+users_updated = Signal()
+
+# Largest value of the BigAutoField primary keys, larger ids match no row
+MAX_ID = 2**63 - 1
 
 
 class CustomUserManager(BaseUserManager):
@@ -25,6 +43,41 @@ class CustomUserManager(BaseUserManager):
 
         return self.create_user(email, password, **extra_fields)
 
+    def add_to_counter(self, field, deltas, **updates):
+        # Add {user_id: delta} to a counter column in place, with one UPDATE
+        # per distinct delta, and apply the other updates to the same rows
+        by_delta = defaultdict(set)
+        for user_id, delta in deltas.items():
+            by_delta[delta].add(user_id)
+        for delta, user_ids in by_delta.items():
+            self.filter(pk__in=user_ids).update(**{field: F(field) + delta}, **updates)
+        if deltas:
+            user_ids = set(deltas)
+            transaction.on_commit(
+                lambda: users_updated.send(sender=CustomUser, user_ids=user_ids)
+            )
+
+    def bump_friends_version(self, user_ids, friend_count_deltas=None):
+        # Mark the friend lists of the users as changed, invalidating the
+        # ETags and cached pages derived from their version, and add the
+        # deltas to their friend counts
+        deltas = dict.fromkeys(user_ids, 0)
+        deltas.update(friend_count_deltas or {})
+        self.add_to_counter(
+            "friend_count",
+            deltas,
+            friends_version=F("friends_version") + 1,
+            friends_changed_at=timezone.now(),
+        )
+
+    def add_pending_requests(self, to_user_ids, sign=1):
+        # Count requests received (sign=1) or removed (sign=-1) in the pending
+        # request counters of their recipients
+        deltas = {
+            user_id: sign * count for user_id, count in Counter(to_user_ids).items()
+        }
+        self.add_to_counter("pending_request_count", deltas)
+
 
 class CustomUser(AbstractUser):
     # Custom user model extending AbstractUser
@@ -33,13 +86,214 @@ class CustomUser(AbstractUser):
         max_length=150, blank=True, null=True
     )  # You can keep username field, but it's not mandatory
 
+    # Bumped with update() whenever a friendship of the user is created or
+    # deleted, see CustomUserManager.bump_friends_version
+    friends_version = models.PositiveIntegerField(default=0, editable=False)
+    friends_changed_at = models.DateTimeField(null=True, editable=False)
+    # Friends and pending received requests, kept in step with F() updates in
+    # the transactions changing them. reconcile_counters repairs any drift.
+    friend_count = models.IntegerField(default=0, editable=False)
+    pending_request_count = models.IntegerField(default=0, editable=False)
+
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
     objects = CustomUserManager()
 
+    # Only ever changed with update(), the values loaded on an instance may be
+    # stale and must not be written back by save()
+    UPDATE_ONLY_FIELDS = (
+        "friends_version",
+        "friends_changed_at",
+        "friend_count",
+        "pending_request_count",
+    )
+
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored email, so save() can tell a change without a query
+        instance._stored_email = instance.__dict__.get("email", DEFERRED)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using, fields, **kwargs)
+        if fields is None or "email" in fields:
+            self._stored_email = self.email
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            self._stored_email = self.email
+            return
+        if kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.UPDATE_ONLY_FIELDS
+            ]
+        # Friend lists show the email of each friend
+        email_changed = False
+        if "email" in kwargs["update_fields"]:
+            stored = getattr(self, "_stored_email", DEFERRED)
+            if stored is DEFERRED:
+                # Loaded without its email, or not loaded from the database
+                email_changed = (
+                    CustomUser.objects.filter(pk=self.pk)
+                    .exclude(email=self.email)
+                    .exists()
+                )
+            else:
+                email_changed = stored != self.email
+        super().save(*args, **kwargs)
+        if "email" in kwargs["update_fields"]:
+            self._stored_email = self.email
+        if email_changed:
+            CustomUser.objects.bump_friends_version(Friend.objects.friend_ids(self))
+
+
+class FriendRequestQuerySet(models.QuerySet):
+    def send(self, pairs, batch_size=None):
+        # Create pending (from_user_id, to_user_id) requests and return the
+        # pairs actually created. Pairs sent concurrently are dropped and
+        # retried, so counters and the change feed only see inserted rows.
+        pairs = list(dict.fromkeys(pairs))
+        with transaction.atomic(savepoint=False):
+            while pairs:
+                try:
+                    with transaction.atomic():
+                        self.bulk_create(
+                            [
+                                FriendRequest(from_user_id=a, to_user_id=b)
+                                for a, b in pairs
+                            ],
+                            batch_size=batch_size,
+                        )
+                    break
+                except IntegrityError:
+                    # The conflicting requests are committed, drop them
+                    existing = set(
+                        self.filter(
+                            from_user_id__in={a for a, _ in pairs},
+                            to_user_id__in={b for _, b in pairs},
+                        ).values_list("from_user_id", "to_user_id")
+                    )
+                    remaining = [pair for pair in pairs if pair not in existing]
+                    if len(remaining) == len(pairs):
+                        raise
+                    pairs = remaining
+            CustomUser.objects.add_pending_requests(b for _, b in pairs)
+            FriendshipEvent.objects.record(
+                FriendshipEvent.REQUEST_RECEIVED, [(b, a) for a, b in pairs]
+            )
+        return pairs
+
+    def delete_counted(self):
+        # Delete the requests without post_delete signals and return how many
+        # were deleted, for callers that update the pending counters and the
+        # feed themselves. Nothing references FriendRequest, so no cascade is
+        # skipped.
+        return self._raw_delete(self.db)
+
+    def accept(self):
+        # Accept every pending request of the queryset in one transaction and
+        # return the ids of the accepted requests
+        with transaction.atomic():
+            rows = list(
+                self.filter(accepted=False)
+                .select_for_update()
+                .values_list("id", "from_user_id", "to_user_id")
+            )
+            if not rows:
+                return []
+            ids = [pk for pk, _, _ in rows]
+            FriendRequest.objects.filter(pk__in=ids).delete_counted()
+            CustomUser.objects.add_pending_requests(
+                [to_user_id for _, _, to_user_id in rows], sign=-1
+            )
+            pairs = [(from_user_id, to_user_id) for _, from_user_id, to_user_id in rows]
+            Friend.objects.create_accepted(pairs)
+            transaction.on_commit(
+                lambda: friendships_created.send(sender=Friend, pairs=pairs)
+            )
+        return ids
+
+    def reject(self):
+        # Reject every pending request of the queryset in one transaction and
+        # return the ids of the rejected requests
+        with transaction.atomic():
+            rows = list(
+                self.filter(accepted=False)
+                .select_for_update()
+                .values_list("id", "from_user_id", "to_user_id")
+            )
+            ids = [pk for pk, _, _ in rows]
+            if ids:
+                FriendRequest.objects.filter(pk__in=ids).delete_counted()
+                CustomUser.objects.add_pending_requests(
+                    [to_user_id for _, _, to_user_id in rows], sign=-1
+                )
+                FriendshipEvent.objects.record(
+                    FriendshipEvent.REQUEST_REJECTED,
+                    [
+                        (to_user_id, from_user_id)
+                        for _, from_user_id, to_user_id in rows
+                    ],
+                )
+        return ids
+
+    def expired(self, ttl_days=None):
+        # Pending requests older than ttl_days (FRIEND_REQUEST_TTL_DAYS by
+        # default), none when the TTL is 0
+        if ttl_days is None:
+            ttl_days = getattr(settings, "FRIEND_REQUEST_TTL_DAYS", 0)
+        if not ttl_days:
+            return self.none()
+        return self.filter(
+            accepted=False, created_at__lt=timezone.now() - timedelta(days=ttl_days)
+        )
+
+    def archive(self, keep=True):
+        # Move every pending request of the queryset to ArchivedFriendRequest
+        # (or only delete them if keep is False) in one transaction and return
+        # their ids
+        with transaction.atomic():
+            rows = list(
+                self.filter(accepted=False)
+                .select_for_update()
+                .values_list("id", "from_user_id", "to_user_id", "created_at")
+            )
+            ids = [pk for pk, _, _, _ in rows]
+            if ids:
+                if keep:
+                    # Archived rows keep their id, so a retried batch is harmless
+                    ArchivedFriendRequest.objects.bulk_create(
+                        [
+                            ArchivedFriendRequest(
+                                id=pk,
+                                from_user_id=from_user_id,
+                                to_user_id=to_user_id,
+                                created_at=created_at,
+                            )
+                            for pk, from_user_id, to_user_id, created_at in rows
+                        ],
+                        ignore_conflicts=True,
+                    )
+                FriendRequest.objects.filter(pk__in=ids).delete_counted()
+                CustomUser.objects.add_pending_requests(
+                    [to_user_id for _, _, to_user_id, _ in rows], sign=-1
+                )
+                FriendshipEvent.objects.record(
+                    FriendshipEvent.REQUEST_EXPIRED,
+                    [
+                        (to_user_id, from_user_id)
+                        for _, from_user_id, to_user_id, _ in rows
+                    ],
+                )
+        return ids
+
 
 class FriendRequest(models.Model):
     # Model to represent friend requests
@@ -52,25 +306,424 @@ class FriendRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     accepted = models.BooleanField(default=False)
 
+    objects = FriendRequestQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["from_user", "to_user"], name="unique_friend_request"
+            ),
+        ]
+        indexes = [
+            # Serves the pending requests inbox, ordered by (created_at, id)
+            models.Index(
+                fields=["to_user", "accepted", "created_at", "id"],
+                name="friendrequest_inbox_idx",
+            ),
+        ]
+
     def accept(self):
-        # Accept the friend request and create a friendship
+        # Accept the friend request and create the friendship atomically.
+        # Returns False if the request was already accepted or removed.
+        with transaction.atomic():
+            # Deleting first makes concurrent accepts race on a single row
+            deleted = FriendRequest.objects.filter(
+                pk=self.pk, accepted=False
+            ).delete_counted()
+            if not deleted:
+                return False
+            CustomUser.objects.add_pending_requests([self.to_user_id], sign=-1)
+            pairs = [(self.from_user_id, self.to_user_id)]
+            Friend.objects.create_accepted(pairs)
+            transaction.on_commit(
+                lambda: friendships_created.send(sender=Friend, pairs=pairs)
+            )
         self.accepted = True
-        self.save()
-        # Create a new friend object to represent the friendship
-        Friend.objects.create(user=self.from_user, friend=self.to_user)
-        Friend.objects.create(user=self.to_user, friend=self.from_user)
+        return True
 
     def reject(self):
-        # Reject the friend request
-        self.delete()
+        # Reject the friend request, releasing the recipient's pending count
+        with transaction.atomic():
+            deleted = FriendRequest.objects.filter(
+                pk=self.pk, accepted=False
+            ).delete_counted()
+            if deleted:
+                CustomUser.objects.add_pending_requests([self.to_user_id], sign=-1)
+                FriendshipEvent.objects.record(
+                    FriendshipEvent.REQUEST_REJECTED,
+                    [(self.to_user_id, self.from_user_id)],
+                )
+
+
+class ArchivedFriendRequest(models.Model):
+    # Pending friend requests that expired, moved out of FriendRequest by
+    # prune_friend_requests under their original id
+    id = models.BigIntegerField(primary_key=True)
+    from_user = models.ForeignKey(
+        CustomUser, related_name="+", on_delete=models.CASCADE
+    )
+    to_user = models.ForeignKey(CustomUser, related_name="+", on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+
+def canonical_friendships():
+    # Whether friendships are stored as one Friendship row per pair instead of
+    # two Friend rows, see FRIENDSHIP_STORAGE
+    return getattr(settings, "FRIENDSHIP_STORAGE", "symmetric") == "canonical"
+
+
+def dual_write_friendships():
+    # Whether friendships are also written to the storage not in use, while
+    # migrate_friendships moves them, see FRIENDSHIP_DUAL_WRITE
+    return getattr(settings, "FRIENDSHIP_DUAL_WRITE", False)
+
+
+def canonical_rows(pairs):
+    return [Friendship(low_id=min(a, b), high_id=max(a, b)) for a, b in pairs]
+
+
+def symmetric_rows(pairs):
+    # Both rows of a friendship share its creation time
+    now = timezone.now()
+    return [
+        Friend(user_id=user_id, friend_id=friend_id, created_at=now)
+        for a, b in pairs
+        for user_id, friend_id in ((a, b), (b, a))
+    ]
+
+
+class FriendManager(models.Manager):
+    # Every read and write of friendships goes through these methods, which
+    # use the Friend or Friendship table depending on FRIENDSHIP_STORAGE
+
+    def create_friendships(self, pairs, new_only=False):
+        # Create each (user_id, friend_id) friendship with a single insert,
+        # skipping friendships that already exist. Callers that already
+        # filtered out existing friendships pass new_only=True.
+        with transaction.atomic(savepoint=False):
+            if not new_only:
+                pairs = self.exclude_existing(pairs)
+            if canonical_friendships():
+                friends = Friendship.objects.bulk_create(
+                    canonical_rows(pairs), ignore_conflicts=True
+                )
+            else:
+                friends = self.bulk_create(symmetric_rows(pairs), ignore_conflicts=True)
+            if dual_write_friendships():
+                self.mirror_created(pairs)
+            CustomUser.objects.bump_friends_version(
+                (),
+                friend_count_deltas=Counter(
+                    user_id for pair in pairs for user_id in pair
+                ),
+            )
+            FriendshipEvent.objects.record(
+                FriendshipEvent.FRIEND_ADDED, [*pairs, *((b, a) for a, b in pairs)]
+            )
+        return friends
+
+    def create_accepted(self, pairs):
+        # Create the friendships of accepted (from_user_id, to_user_id)
+        # requests. A recipient who is already friends with the sender still
+        # gets a friend_added event, which ends the request in their feed.
+        new = self.exclude_existing(pairs)
+        self.create_friendships(new, new_only=True)
+        created = {frozenset(pair) for pair in new}
+        FriendshipEvent.objects.record(
+            FriendshipEvent.FRIEND_ADDED,
+            [(b, a) for a, b in pairs if frozenset((a, b)) not in created],
+        )
+
+    def mirror_created(self, pairs):
+        # Write new friendships to the storage not in use too, without counting
+        # them again
+        if canonical_friendships():
+            self.bulk_create(symmetric_rows(pairs), ignore_conflicts=True)
+        else:
+            Friendship.objects.bulk_create(canonical_rows(pairs), ignore_conflicts=True)
+
+    def mirror_deleted(self, pairs):
+        # Delete removed friendships from the storage not in use too
+        canonical = not canonical_friendships()
+        rows = self.stored_pairs(pairs, canonical)
+        model = Friendship if canonical else Friend
+        model.objects.filter(pk__in=rows).delete()
+
+    def stored_pairs(self, pairs, canonical):
+        # {row id: (low, high)} of the rows of the given storage holding the
+        # friendships of the (user_id, friend_id) pairs, both directions of
+        # symmetric storage included
+        pairs = {(min(a, b), max(a, b)) for a, b in pairs}
+        lows = {low for low, _ in pairs}
+        highs = {high for _, high in pairs}
+        if canonical:
+            rows = Friendship.objects.filter(low_id__in=lows, high_id__in=highs)
+            rows = rows.values_list("pk", "low_id", "high_id")
+        else:
+            rows = self.filter(
+                Q(user_id__in=lows, friend_id__in=highs)
+                | Q(user_id__in=highs, friend_id__in=lows)
+            ).values_list(
+                "pk", Least("user_id", "friend_id"), Greatest("user_id", "friend_id")
+            )
+        return {pk: (low, high) for pk, low, high in rows if (low, high) in pairs}
+
+    def exclude_existing(self, pairs):
+        # Drop the pairs that are friends already. Both directions are always
+        # stored, so look up from the side with the fewest distinct users.
+        unique = {}
+        for a, b in pairs:
+            if a != b:
+                unique.setdefault((min(a, b), max(a, b)), (a, b))
+        if not unique:
+            return []
+        if canonical_friendships():
+            existing = set(
+                Friendship.objects.filter(
+                    low_id__in={low for low, _ in unique},
+                    high_id__in={high for _, high in unique},
+                ).values_list("low_id", "high_id")
+            )
+            return [pair for key, pair in unique.items() if key not in existing]
+        pairs = list(unique.values())
+        lows = {a for a, _ in pairs}
+        highs = {b for _, b in pairs}
+        if len(highs) < len(lows):
+            lows, highs = highs, lows
+        existing = set(
+            self.filter(user_id__in=lows, friend_id__in=highs).values_list(
+                "user_id", "friend_id"
+            )
+        )
+        return [
+            (a, b)
+            for a, b in pairs
+            if (a, b) not in existing and (b, a) not in existing
+        ]
+
+    def friend_pairs(self, user_ids):
+        # (user_id, friend_id) pairs of every friendship of the given users
+        if canonical_friendships():
+            rows = Friendship.objects.order_by()
+            return (
+                rows.filter(low_id__in=user_ids)
+                .values_list("low_id", "high_id")
+                .union(
+                    rows.filter(high_id__in=user_ids).values_list("high_id", "low_id"),
+                    all=True,
+                )
+            )
+        return self.filter(user_id__in=user_ids).values_list("user_id", "friend_id")
+
+    def friend_ids(self, user, among=None):
+        # Set of the ids of the user's friends, only those in among if given
+        if canonical_friendships():
+            rows = Friendship.objects.order_by()
+            lows = rows.filter(high=user)
+            highs = rows.filter(low=user)
+            if among is not None:
+                lows = lows.filter(low_id__in=among)
+                highs = highs.filter(high_id__in=among)
+            return set(
+                highs.values_list("high_id", flat=True).union(
+                    lows.values_list("low_id", flat=True), all=True
+                )
+            )
+        rows = self.filter(user=user)
+        if among is not None:
+            rows = rows.filter(friend_id__in=among)
+        return set(rows.values_list("friend_id", flat=True))
+
+    def between(self, user, other):
+        # The rows of the friendship of two users, other may be an OuterRef
+        if canonical_friendships():
+            return Friendship.objects.filter(
+                Q(low=user, high=other) | Q(low=other, high=user)
+            )
+        return self.filter(user=user, friend=other)
+
+    def friend_list(self, user):
+        # Friend list rows of a user as plain dicts, with each friend's email
+        # joined in the same query instead of fetched by the client
+        if canonical_friendships():
+            # The row is shared with the friend, pick the other side of it
+            user_is_low = Q(low=user)
+            return Friendship.objects.filter(user_is_low | Q(high=user)).values(
+                "id",
+                "created_at",
+                user=Value(user.pk, output_field=models.IntegerField()),
+                friend=Case(
+                    When(user_is_low, then=F("high_id")),
+                    default=F("low_id"),
+                    output_field=models.IntegerField(),
+                ),
+                # A subquery rather than a join, so only the rows of the page
+                # look their friend up, after sorting
+                friend_email=Subquery(
+                    CustomUser.objects.filter(pk=OuterRef("friend")).values("email")
+                ),
+            )
+        return self.filter(user=user).values(
+            "id", "user", "friend", "created_at", friend_email=F("friend__email")
+        )
 
 
 class Friend(models.Model):
-    # Model to represent friendships
+    # Model to represent friendships, one row per direction
     user = models.ForeignKey(
         CustomUser, related_name="friends", on_delete=models.CASCADE
     )
     friend = models.ForeignKey(
         CustomUser, related_name="user_friends", on_delete=models.CASCADE
     )
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, migrate_friendships copies it between storages
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = FriendManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "friend"], name="unique_friend"),
+        ]
+        indexes = [
+            # Serves the friend list of a user, ordered by id
+            models.Index(fields=["user", "id"], name="friend_list_idx"),
+        ]
+
+
+class Friendship(models.Model):
+    # Canonical friendship storage, one row per pair with low_id < high_id.
+    # Half the rows of Friend; used when FRIENDSHIP_STORAGE is "canonical".
+    # The FKs are not indexed on their own, the two composite indexes below
+    # cover every lookup of one user's friendships from either side.
+    low = models.ForeignKey(
+        CustomUser, related_name="+", on_delete=models.CASCADE, db_index=False
+    )
+    high = models.ForeignKey(
+        CustomUser, related_name="+", on_delete=models.CASCADE, db_index=False
+    )
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["low", "high"], name="unique_friendship"),
+            models.CheckConstraint(
+                check=Q(low__lt=F("high")), name="friendship_low_lt_high"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["high", "low"], name="friendship_high_low_idx"),
+        ]
+
+
+class FriendshipEventManager(models.Manager):
+    def record(self, kind, pairs):
+        # Append a kind event about other_id to the feed of user_id for each
+        # (user_id, other_id) pair, in the caller's transaction
+        return self.bulk_create(
+            [
+                self.model(kind=kind, user_id=user_id, other_id=other_id)
+                for user_id, other_id in pairs
+            ]
+        )
+
+    def changes(self, user, since):
+        # Feed of the user after the since cursor (an event id), oldest first
+        return (
+            self.filter(user=user, id__gt=since)
+            .order_by("id")
+            .values(
+                "id",
+                "kind",
+                "created_at",
+                other_user=F("other_id"),
+                email=Subquery(
+                    CustomUser.objects.filter(pk=OuterRef("other_id")).values("email")
+                ),
+            )
+        )
+
+
+class FriendshipEvent(models.Model):
+    # Append-only log of the changes to each user's friend list and pending
+    # requests, written in the transactions making them and read by
+    # /friend-list/changes/. Old entries are removed by
+    # compact_friendship_events.
+    FRIEND_ADDED = "friend_added"  # Also ends a pending request between them
+    FRIEND_REMOVED = "friend_removed"
+    REQUEST_RECEIVED = "request_received"
+    REQUEST_REJECTED = "request_rejected"
+    REQUEST_EXPIRED = "request_expired"
+    REQUEST_CANCELLED = "request_cancelled"  # Deleted with the sender or alone
+    KINDS = [
+        (FRIEND_ADDED, "Friend added"),
+        (FRIEND_REMOVED, "Friend removed"),
+        (REQUEST_RECEIVED, "Request received"),
+        (REQUEST_REJECTED, "Request rejected"),
+        (REQUEST_EXPIRED, "Request expired"),
+        (REQUEST_CANCELLED, "Request cancelled"),
+    ]
+
+    # No constraint: events are written while users are being deleted, the
+    # feed of a deleted user is removed by a signal afterwards. other_id may
+    # name a deleted user.
+    user = models.ForeignKey(
+        CustomUser,
+        related_name="+",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+    )
+    other_id = models.BigIntegerField()
+    kind = models.CharField(max_length=20, choices=KINDS)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = FriendshipEventManager()
+
+    class Meta:
+        indexes = [
+            # Serves the changes of a user after a cursor
+            models.Index(fields=["user", "id"], name="friendship_event_feed_idx"),
+        ]
+
+
+class UserSearchToken(models.Model):
+    # Model to store the n-gram tokens used by the user search index
+    user = models.ForeignKey(
+        CustomUser, related_name="search_tokens", on_delete=models.CASCADE
+    )
+    token = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["token", "user"], name="unique_user_search_token"
+            ),
+        ]
+
+
+class FriendSuggestion(models.Model):
+    # Model to store precomputed friend-of-friend suggestions
+    user = models.ForeignKey(
+        CustomUser, related_name="friend_suggestions", on_delete=models.CASCADE
+    )
+    suggested_user = models.ForeignKey(
+        CustomUser, related_name="+", on_delete=models.CASCADE
+    )
+    mutual_friends = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "suggested_user"], name="unique_friend_suggestion"
+            ),
+        ]
+        indexes = [
+            # Serves the suggestions of a user, best first
+            models.Index(
+                fields=["user", "-mutual_friends", "suggested_user"],
+                name="friend_suggestion_rank_idx",
+            ),
+        ]
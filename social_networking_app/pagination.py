@@ -0,0 +1,298 @@
+import base64
+import binascii
+import datetime
+import json
+import logging
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+PAGINATION_MODE_PARAM = "pagination"
+CURSOR_MODE = "cursor"
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    # Keep full microsecond precision, cursors must match stored values exactly
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def get_total_count(view, request):
+    # Views whose total is a counter column of the logged in user name it in
+    # total_count_field, so no COUNT(*) runs. The counter only holds the
+    # total of the unfiltered list: None when one of the view's
+    # total_count_filters is in the query string.
+    field = getattr(view, "total_count_field", None)
+    filters = getattr(view, "total_count_filters", ())
+    if field is None or any(request.query_params.get(name) for name in filters):
+        return None
+    return getattr(request.user, field)
+
+
+class CountedPaginator(Paginator):
+    """
+    Django paginator using a total known in advance instead of a COUNT(*).
+    """
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = count
+        if count is not None:
+            self.count = count
+
+    def page(self, number):
+        if self.known_count is None:
+            return super().page(number)
+        # Always fetch a full page, so a drifted count only affects the
+        # total and the links, never the rows
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom : bottom + self.per_page], number, self
+        )
+
+
+class CustomPagination(PageNumberPagination):
+    """
+    Custom pagination class to handle paginated responses.
+    """
+
+    page_size = 10  # Specify the number of items per page
+    page_size_query_param = "page_size"
+    max_page_size = 1000  # Optionally specify the maximum page size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            CountedPaginator, count=get_total_count(view, request)
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        """
+        Generate paginated response.
+        """
+        logger.debug("Paginated response created")  # Log a debug message
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "count": self.page.paginator.count,
+                "results": data,
+            }
+        )
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on a unique, ordered tuple of columns.
+
+    Each page is fetched with a ``WHERE (a, b) > (last_a, last_b)`` style filter
+    instead of an ``OFFSET``, so deep pages cost the same as the first one.
+    Cursors are opaque tokens; total counts are only computed when the client
+    asks for them with ``?count=true``.
+    """
+
+    ordering = ("id",)  # Must end with a unique column
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return the rows of the requested page.
+        """
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if self.include_count:
+            self.count = get_total_count(view, request)
+            if self.count is None:
+                self.count = queryset.count()
+        return self.paginate_rows(list(page_queryset))
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        Build the lazy queryset for the requested page, without evaluating it.
+        """
+        self.request = request
+        self.ordering = self.get_ordering(view)
+        self.page_size = self.get_page_size(request)
+        self.include_count = request.query_params.get(
+            self.count_query_param, ""
+        ).lower() in ("1", "true", "yes")
+        self.count = None
+        position, self.reverse = self.decode_cursor(request)
+        self.has_cursor = position is not None
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self.invert(field) for field in ordering]
+        if position is not None:
+            position = self.clean_position(queryset, position)
+            queryset = queryset.filter(self.position_filter(ordering, position))
+        # Fetch one extra row to learn whether there is a further page
+        return queryset.order_by(*ordering)[: self.page_size + 1]
+
+    def paginate_rows(self, rows):
+        """
+        Turn the rows fetched by ``get_page_queryset`` into the page.
+        """
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.has_cursor
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        """
+        Build the response body for the current page.
+        """
+        body = {"next": self.get_next_link(), "previous": self.get_previous_link()}
+        if self.include_count:
+            body["count"] = self.count
+        body["results"] = data
+        return body
+
+    def get_ordering(self, view):
+        # Views may override the ordering with a ``cursor_ordering`` attribute
+        return tuple(getattr(view, "cursor_ordering", None) or self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.build_link(self.page[0], reverse=True)
+
+    def build_link(self, row, reverse):
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, PAGINATION_MODE_PARAM, CURSOR_MODE)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(row, reverse)
+        )
+
+    def encode_cursor(self, row, reverse):
+        """
+        Encode the ordering key of a row into an opaque cursor token.
+        """
+        position = [self.get_value(row, field.lstrip("-")) for field in self.ordering]
+        payload = json.dumps({"p": position, "r": int(reverse)}, cls=CursorJSONEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        """
+        Return the (position, reverse) pair encoded in the request cursor.
+        """
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            position, reverse = payload["p"], bool(payload["r"])
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound("Invalid cursor.")
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound("Invalid cursor.")
+        return position, reverse
+
+    def clean_position(self, queryset, position):
+        # Convert the cursor's JSON values to the types of the ordering fields,
+        # a crafted cursor must not reach the query
+        cleaned = []
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip("-")
+            annotation = queryset.query.annotations.get(name)
+            if annotation is not None:
+                model_field = annotation.output_field
+            else:
+                model_field = queryset.model._meta.get_field(name)
+            if value is None or isinstance(value, (dict, list)):
+                raise NotFound("Invalid cursor.")
+            try:
+                cleaned.append(model_field.to_python(value))
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound("Invalid cursor.")
+        return cleaned
+
+    @staticmethod
+    def get_value(row, field):
+        # Rows are model instances, or dicts when the queryset uses values()
+        if isinstance(row, dict):
+            return row[field]
+        return getattr(row, field)
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith("-") else "-" + field
+
+    @staticmethod
+    def position_filter(ordering, position):
+        """
+        Build the lexicographic "comes after position" filter for the ordering.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+
+class SelectablePaginationMixin:
+    """
+    Let clients opt into keyset pagination with ``?pagination=cursor``.
+
+    Views keep page-number pagination (``pagination_class``) by default and
+    declare the keyset paginator to use in ``cursor_pagination_class``.
+    """
+
+    cursor_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            params = self.request.query_params
+            if (
+                params.get(PAGINATION_MODE_PARAM) == CURSOR_MODE
+                or KeysetPagination.cursor_query_param in params
+            ):
+                self._paginator = self.cursor_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
@@ -0,0 +1,86 @@
+"""
+Degrees of separation between two users.
+
+The shortest friendship path is found with a bidirectional breadth-first
+search: one search grows from each user and the path is complete as soon as
+they touch. Each step expands the smaller of the two frontiers as a whole,
+so a step costs one adjacency load for the entire frontier (a
+``user_id__in=frontier`` query per chunk) instead of one query per user, and
+the number of users visited grows with half the path length on each side.
+
+Adjacency comes from the friend graph cache by default, which loads missing
+users in the same way and answers repeated searches from memory. Set
+``FRIEND_PATH_USE_CACHE = False`` to always read the friendship tables.
+"""
+
+from django.conf import settings
+
+from .friend_cache import friend_graph
+from .suggestions import load_adjacency
+
+
+def get_max_depth():
+    return getattr(settings, "FRIEND_PATH_MAX_DEPTH", 6)
+
+
+def default_adjacency():
+    if getattr(settings, "FRIEND_PATH_USE_CACHE", True):
+        return friend_graph.get_many
+    return load_adjacency
+
+
+def shortest_path(source_id, target_id, max_depth=None, adjacency=None):
+    """
+    Return the user ids on a shortest friendship path from source_id to
+    target_id, both included, or None when there is none of at most
+    max_depth friendships. adjacency maps a list of user ids to
+    {user_id: friend ids}.
+    """
+    max_depth = get_max_depth() if max_depth is None else max_depth
+    adjacency = adjacency or default_adjacency()
+    if source_id == target_id:
+        return [source_id]
+    # Each side maps the users it reached to the user it reached them from
+    forward = {source_id: None}
+    backward = {target_id: None}
+    forward_frontier = [source_id]
+    backward_frontier = [target_id]
+    depth = 0
+    while forward_frontier and backward_frontier and depth < max_depth:
+        expand_forward = len(forward_frontier) <= len(backward_frontier)
+        if expand_forward:
+            frontier, reached, other = forward_frontier, forward, backward
+        else:
+            frontier, reached, other = backward_frontier, backward, forward
+        next_frontier = []
+        for user_id, friend_ids in adjacency(frontier).items():
+            for friend_id in friend_ids:
+                if friend_id in reached:
+                    continue
+                reached[friend_id] = user_id
+                if friend_id in other:
+                    # Frontiers are expanded whole, the first meeting is the
+                    # shortest
+                    return join(forward, backward, friend_id)
+                next_frontier.append(friend_id)
+        if expand_forward:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+        depth += 1
+    return None
+
+
+def join(forward, backward, meeting_id):
+    # Follow both parent maps out from the meeting user
+    path = []
+    user_id = meeting_id
+    while user_id is not None:
+        path.append(user_id)
+        user_id = forward[user_id]
+    path.reverse()
+    user_id = backward[meeting_id]
+    while user_id is not None:
+        path.append(user_id)
+        user_id = backward[user_id]
+    return path
@@ -0,0 +1,44 @@
+"""
+JSON rendering with orjson when it is installed.
+"""
+
+from rest_framework.renderers import JSONRenderer
+
+from .instrumentation import phase
+
+try:
+    import orjson
+except ImportError:  # Optional, rendering falls back to the standard library
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson, several times faster than the json
+    module on large pages. Dates and other types orjson does not handle the
+    same way go through DRF's encoder, so the output is the same as
+    JSONRenderer's. Indented or ASCII-only output and missing orjson fall
+    back to it.
+    """
+
+    options = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with phase("render"):
+            if (
+                orjson is None
+                or data is None
+                or not self.compact
+                or self.ensure_ascii
+                or self.get_indent(accepted_media_type, renderer_context or {})
+            ):
+                return super().render(data, accepted_media_type, renderer_context)
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=self.options
+            )
+            # Escape line separators like JSONRenderer, for JavaScript
+            return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
@@ -0,0 +1,291 @@
+"""
+Indexed user search.
+
+Every user is indexed as a set of lowercase tokens taken from their email and
+username: all trigrams of each value plus its one and two character prefixes
+(stored with a leading ``^`` so they never collide with trigrams). A query is
+answered from the ``UserSearchToken`` table instead of scanning ``CustomUser``:
+
+* a full email address is first looked up through the unique ``email`` index;
+* queries of three or more characters take their candidates from the rarest
+  trigram of the query, then verify them with a substring check;
+* shorter queries match on the prefix tokens.
+
+The trigrams laid side by side over the query have their users counted up to
+``SEARCH_MAX_CANDIDATES`` (default 1000), so common trigrams such as ``com``
+never have their whole posting list read, and the counts are cached for
+``SEARCH_FREQUENCY_CACHE_TIMEOUT`` seconds. At most that many candidates are
+considered: when even the rarest trigram is more common, only its first users
+by id are, and the results (and their count) are limited to those.
+
+Results are ranked exact email match first, then email prefix, username prefix
+and finally plain substring matches, ties broken by id.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Case,
+    CharField,
+    Count,
+    IntegerField,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+
+from .models import MAX_ID, CustomUser, UserSearchToken
+
+NGRAM_SIZE = 3
+PREFIX_MARKER = "^"
+INDEXED_FIELDS = ("email", "username")
+
+
+def normalize(value):
+    # Normalize a value before tokenizing it or matching against it
+    return (value or "").strip().lower()
+
+
+def tokenize(value):
+    """
+    Return the set of index tokens for a single value.
+    """
+    value = normalize(value)
+    tokens = {PREFIX_MARKER + value[:size] for size in (1, 2) if len(value) >= size}
+    tokens.update(value[i : i + NGRAM_SIZE] for i in range(len(value) - NGRAM_SIZE + 1))
+    return tokens
+
+
+def query_tokens(query):
+    """
+    Return the tokens a user must own to match the query.
+    """
+    query = normalize(query)
+    if len(query) < NGRAM_SIZE:
+        return {PREFIX_MARKER + query}
+    return {query[i : i + NGRAM_SIZE] for i in range(len(query) - NGRAM_SIZE + 1)}
+
+
+def probed_tokens(query):
+    """
+    Return the query tokens whose frequencies pick the candidates: trigrams
+    covering the query side by side, the last one overlapping if needed.
+    """
+    query = normalize(query)
+    if len(query) <= NGRAM_SIZE:
+        return query_tokens(query)
+    last = len(query) - NGRAM_SIZE
+    starts = [*range(0, last, NGRAM_SIZE), last]
+    return {query[i : i + NGRAM_SIZE] for i in starts}
+
+
+def user_tokens(user):
+    # Collect the tokens of every indexed field of the user
+    tokens = set()
+    for field in INDEXED_FIELDS:
+        tokens |= tokenize(getattr(user, field))
+    return tokens
+
+
+def index_user(user, created=False):
+    """
+    Bring the search tokens of one user in sync with its current fields.
+    """
+    wanted = user_tokens(user)
+    existing = (
+        set()
+        if created
+        else set(
+            UserSearchToken.objects.filter(user=user).values_list("token", flat=True)
+        )
+    )
+    stale = existing - wanted
+    if stale:
+        UserSearchToken.objects.filter(user=user, token__in=stale).delete()
+    UserSearchToken.objects.bulk_create(
+        [UserSearchToken(user=user, token=token) for token in wanted - existing],
+        ignore_conflicts=True,
+    )
+
+
+def index_users(users, batch_size=5000):
+    """
+    (Re)build the search tokens of many users at once, e.g. after bulk_create.
+    """
+    users = list(users)
+    with transaction.atomic():
+        UserSearchToken.objects.filter(user__in=[user.pk for user in users]).delete()
+        UserSearchToken.objects.bulk_create(
+            [
+                UserSearchToken(user_id=user.pk, token=token)
+                for user in users
+                for token in user_tokens(user)
+            ],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+
+
+def exact_email_match(query):
+    """
+    Return a queryset of the user owning the query as email, or None when the
+    query cannot be an email address.
+    """
+    query = query.strip()
+    if "@" not in query:
+        return None
+    # Fast path: a complete email address hits the unique email index
+    return (
+        CustomUser.objects.filter(email=CustomUser.objects.normalize_email(query))
+        .annotate(search_rank=Value(0, output_field=IntegerField()))
+        .order_by("search_rank", "id")
+    )
+
+
+def get_max_candidates():
+    return getattr(settings, "SEARCH_MAX_CANDIDATES", 1000)
+
+
+def token_frequencies(tokens):
+    """
+    Return a queryset of (token, users) rows, users counted up to one more
+    than the candidate limit. Tokens nobody owns count 0.
+    """
+    limit = get_max_candidates()
+    postings = UserSearchToken.objects.order_by("user_id").values("user_id")
+    # Each count walks the (token, user) index up to the limit-th user
+    counts = [
+        UserSearchToken.objects.filter(
+            token=token,
+            user_id__lte=Coalesce(
+                Subquery(postings.filter(token=token)[limit : limit + 1]), MAX_ID
+            ),
+        )
+        .values_list(Value(token, output_field=CharField()))
+        .annotate(users=Count("*"))
+        for token in sorted(tokens)
+    ]
+    return counts[0].union(*counts[1:], all=True)
+
+
+def frequency_key(token):
+    # Hex encoded, any character can be searched for
+    return f"search-token:{get_max_candidates()}:{token.encode().hex()}"
+
+
+def cached_frequencies(tokens):
+    """
+    Return {token: users} as counted by ``token_frequencies``, from the
+    default cache for ``SEARCH_FREQUENCY_CACHE_TIMEOUT`` seconds. Tokens nobody
+    owns are not cached, so a user indexed with them is found right away.
+    """
+    timeout = getattr(settings, "SEARCH_FREQUENCY_CACHE_TIMEOUT", 0)
+    if not timeout:
+        return dict(token_frequencies(tokens))
+    keys = {frequency_key(token): token for token in tokens}
+    frequencies = {keys[key]: users for key, users in cache.get_many(keys).items()}
+    missing = [token for token in tokens if token not in frequencies]
+    if missing:
+        counted = dict(token_frequencies(missing))
+        cache.set_many(
+            {frequency_key(token): users for token, users in counted.items() if users},
+            timeout,
+        )
+        frequencies.update(counted)
+    return frequencies
+
+
+async def acached_frequencies(tokens):
+    """
+    Async version of ``cached_frequencies``.
+    """
+    timeout = getattr(settings, "SEARCH_FREQUENCY_CACHE_TIMEOUT", 0)
+    keys = {frequency_key(token): token for token in tokens}
+    frequencies = {}
+    if timeout:
+        cached = await cache.aget_many(keys)
+        frequencies = {keys[key]: users for key, users in cached.items()}
+    missing = [token for token in tokens if token not in frequencies]
+    if missing:
+        counted = {token: users async for token, users in token_frequencies(missing)}
+        if timeout:
+            await cache.aset_many(
+                {
+                    frequency_key(token): users
+                    for token, users in counted.items()
+                    if users
+                },
+                timeout,
+            )
+        frequencies.update(counted)
+    return frequencies
+
+
+def ranked_matches(query, frequencies=None):
+    """
+    Return a queryset of users matching the query through the token index,
+    annotated with ``search_rank`` and ordered by relevance. frequencies maps
+    the query tokens to their number of users, they are looked up if needed.
+    """
+    term = normalize(query)
+    tokens = probed_tokens(term)
+    if frequencies is None and len(tokens) > 1:
+        frequencies = cached_frequencies(tokens)
+    if frequencies is not None:
+        if not all(frequencies.values()):
+            # A trigram nobody owns, nobody matches
+            return CustomUser.objects.none()
+        tokens = [min(sorted(frequencies), key=frequencies.get)]
+    candidate_ids = (
+        UserSearchToken.objects.filter(token__in=tokens)
+        .order_by("user_id")
+        .values("user_id")[: get_max_candidates()]
+    )
+    users = CustomUser.objects.filter(pk__in=candidate_ids)
+    if len(term) >= NGRAM_SIZE:
+        # The rarest trigram alone doesn't prove a match, check the whole term
+        users = users.filter(Q(email__icontains=term) | Q(username__icontains=term))
+
+    rank = Case(
+        When(email__iexact=term, then=Value(0)),
+        When(email__istartswith=term, then=Value(1)),
+        When(username__istartswith=term, then=Value(2)),
+        default=Value(3),
+        output_field=IntegerField(),
+    )
+    return users.annotate(search_rank=rank).order_by("search_rank", "id")
+
+
+async def aranked_matches(query):
+    """
+    Async version of ``ranked_matches``.
+    """
+    tokens = probed_tokens(query)
+    frequencies = None
+    if len(tokens) > 1:
+        frequencies = await acached_frequencies(tokens)
+    return ranked_matches(query, frequencies)
+
+
+def search_users(query):
+    """
+    Return a queryset of users matching the query, annotated with
+    ``search_rank`` and ordered by relevance.
+    """
+    exact = exact_email_match(query)
+    if exact is not None and exact.exists():
+        return exact
+    return ranked_matches(query)
+
+
+async def asearch_users(query):
+    """
+    Async version of ``search_users``.
+    """
+    exact = exact_email_match(query)
+    if exact is not None and await exact.aexists():
+        return exact
+    return await aranked_matches(query)
@@ -1,19 +1,56 @@
 from django.contrib.auth import authenticate
 from rest_framework import serializers
+from rest_framework.fields import empty
 
-from .models import CustomUser, Friend, FriendRequest
+from .instrumentation import phase
+from .models import MAX_ID, CustomUser, Friend, FriendRequest, FriendSuggestion
 
 
-class UserSignupSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    # Count the time spent (de)serializing in the request metrics
+    def to_representation(self, instance):
+        with phase("serializer"):
+            return super().to_representation(instance)
+
+    def run_validation(self, data=empty):
+        with phase("serializer"):
+            return super().run_validation(data)
+
+
+class UserSignupSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     # Serializer for user signup
     class Meta:
         model = CustomUser
         fields = ["email", "password"]
 
 
+class AuthTokenSerializer(TimedSerializerMixin, serializers.Serializer):
+    # Serializer checking the credentials exchanged for an API token
+    email = serializers.EmailField()
+    password = serializers.CharField(trim_whitespace=False, write_only=True)
 
+    def validate(self, attrs):
+        user = authenticate(
+            self.context.get("request"),
+            email=attrs["email"],
+            password=attrs["password"],
+        )
+        if user is None:
+            raise serializers.ValidationError(
+                "Unable to log in with provided credentials.", code="authorization"
+            )
+        attrs["user"] = user
+        return attrs
 
-class FriendRequestSerializer(serializers.ModelSerializer):
+
+class UserSearchSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # Serializer for user search results
+    class Meta:
+        model = CustomUser
+        fields = ["id", "email", "username"]
+
+
+class FriendRequestSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     # Serializer for friend requests
     to_user = serializers.EmailField()
 
@@ -22,8 +59,42 @@ class FriendRequestSerializer(serializers.ModelSerializer):
         fields = ["to_user"]
 
 
-class FriendSerializer(serializers.ModelSerializer):
-    # Serializer for friends
+class BulkFriendRequestSerializer(TimedSerializerMixin, serializers.Serializer):
+    # Serializer for sending friend requests to many emails at once
+    emails = serializers.ListField(
+        child=serializers.EmailField(), allow_empty=False, max_length=500
+    )
+
+
+class BulkFriendRequestActionSerializer(TimedSerializerMixin, serializers.Serializer):
+    # Serializer selecting received friend requests to accept or reject at once
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=MAX_ID),
+        required=False,
+        max_length=1000,
+    )
+    before = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        if ("ids" in attrs) == ("before" in attrs):
+            raise serializers.ValidationError("Provide either 'ids' or 'before'.")
+        return attrs
+
+
+class FriendSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # Serializer for friends. The friend list renders Friend.objects.friend_list
+    # rows directly, this describes the same fields.
+    friend_email = serializers.EmailField(source="friend.email", read_only=True)
+
     class Meta:
         model = Friend
         fields = "__all__"
+
+
+class FriendSuggestionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # Serializer for friend suggestions
+    email = serializers.EmailField(source="suggested_user.email")
+
+    class Meta:
+        model = FriendSuggestion
+        fields = ["suggested_user", "email", "mutual_friends"]
@@ -0,0 +1,218 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .friend_cache import friend_graph
+from .instrumentation import record_query
+from .models import (
+    CustomUser,
+    Friend,
+    FriendRequest,
+    Friendship,
+    FriendshipEvent,
+    canonical_friendships,
+    dual_write_friendships,
+    friendships_created,
+    users_updated,
+)
+from .search import INDEXED_FIELDS, index_user
+from .suggestions import refresh_queue, refresh_safely
+from .user_cache import invalidate_users
+
+
+@receiver(post_save, sender=CustomUser)
+def update_user_search_index(sender, instance, created, update_fields=None, **kwargs):
+    # Keep the search tokens in sync whenever an indexed field may have changed
+    if update_fields is not None and not set(INDEXED_FIELDS) & set(update_fields):
+        return
+    index_user(instance, created=created)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Deactivated users must stop authenticating, others get fresh fields
+    user_id = instance.pk
+
+    def invalidate():
+        token_cache.revoke_users(user_id)
+        invalidate_users(user_id)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(users_updated)
+def invalidate_updated_users(sender, user_ids, **kwargs):
+    # Cached users carry the friends version used in friend list ETags and
+    # the counters
+    token_cache.invalidate_users(*user_ids)
+    invalidate_users(*user_ids)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    # The key is the primary key, which deletion resets on the instance
+    key = instance.key
+    transaction.on_commit(lambda: token_cache.revoke_keys(key))
+
+
+@receiver(friendships_created)
+def add_cached_friendships(sender, pairs, **kwargs):
+    # Both directions of each new friendship
+    friend_graph.add_edges(pairs + [(b, a) for a, b in pairs])
+
+
+@receiver(friendships_created)
+def refresh_friend_suggestions(sender, pairs, **kwargs):
+    if not settings.FRIEND_SUGGESTIONS_INCREMENTAL:
+        return
+    if settings.FRIEND_SUGGESTIONS_BACKGROUND:
+        refresh_queue.submit(pairs)
+    else:
+        refresh_safely(pairs)
+
+
+@receiver(post_save, sender=Friend)
+def add_cached_friend_row(sender, instance, created, **kwargs):
+    # Friendships created one row at a time, outside FriendRequest.accept().
+    # Rows of the storage not in use (during migrate_friendships) don't count.
+    if created and not canonical_friendships():
+        CustomUser.objects.bump_friends_version([], {instance.user_id: 1})
+        if dual_write_friendships():
+            Friend.objects.mirror_created([(instance.user_id, instance.friend_id)])
+        transaction.on_commit(
+            lambda: friend_graph.add_edges([(instance.user_id, instance.friend_id)])
+        )
+
+
+def deleted_with_user(origin):
+    # Rows cascading from a user deletion, handled at once by
+    # remove_deleted_user_friendships
+    if isinstance(origin, QuerySet):
+        return origin.model is CustomUser
+    return isinstance(origin, CustomUser)
+
+
+@receiver(post_delete, sender=Friend)
+def remove_cached_friend_row(sender, instance, origin=None, **kwargs):
+    if canonical_friendships() or deleted_with_user(origin):
+        return
+    CustomUser.objects.bump_friends_version([], {instance.user_id: -1})
+    FriendshipEvent.objects.record(
+        FriendshipEvent.FRIEND_REMOVED, [(instance.user_id, instance.friend_id)]
+    )
+    if dual_write_friendships():
+        Friend.objects.mirror_deleted([(instance.user_id, instance.friend_id)])
+    transaction.on_commit(
+        lambda: friend_graph.remove_edges([(instance.user_id, instance.friend_id)])
+    )
+
+
+@receiver(post_save, sender=Friendship)
+def add_cached_friendship(sender, instance, created, **kwargs):
+    if created and canonical_friendships():
+        pair = (instance.low_id, instance.high_id)
+        CustomUser.objects.bump_friends_version([], dict.fromkeys(pair, 1))
+        if dual_write_friendships():
+            Friend.objects.mirror_created([pair])
+        transaction.on_commit(lambda: friend_graph.add_edges([pair, pair[::-1]]))
+
+
+@receiver(post_delete, sender=Friendship)
+def remove_cached_friendship(sender, instance, origin=None, **kwargs):
+    if canonical_friendships() and not deleted_with_user(origin):
+        pair = (instance.low_id, instance.high_id)
+        CustomUser.objects.bump_friends_version([], dict.fromkeys(pair, -1))
+        FriendshipEvent.objects.record(
+            FriendshipEvent.FRIEND_REMOVED, [pair, pair[::-1]]
+        )
+        if dual_write_friendships():
+            Friend.objects.mirror_deleted([pair])
+        transaction.on_commit(lambda: friend_graph.remove_edges([pair, pair[::-1]]))
+
+
+@receiver(post_save, sender=FriendRequest)
+def count_pending_request(sender, instance, created, **kwargs):
+    # Requests created one at a time, bulk inserts count them themselves
+    if created and not instance.accepted:
+        CustomUser.objects.add_pending_requests([instance.to_user_id])
+        FriendshipEvent.objects.record(
+            FriendshipEvent.REQUEST_RECEIVED,
+            [(instance.to_user_id, instance.from_user_id)],
+        )
+
+
+@receiver(post_delete, sender=FriendRequest)
+def release_pending_request(sender, instance, origin=None, **kwargs):
+    # Requests deleted one at a time, e.g. from the admin. The queryset
+    # methods delete without signals and count theirs themselves, requests
+    # cascading from a user deletion are counted by release_sent_requests.
+    if instance.accepted or deleted_with_user(origin):
+        return
+    CustomUser.objects.add_pending_requests([instance.to_user_id], sign=-1)
+    FriendshipEvent.objects.record(
+        FriendshipEvent.REQUEST_CANCELLED,
+        [(instance.to_user_id, instance.from_user_id)],
+    )
+
+
+@receiver(pre_delete, sender=CustomUser)
+def release_sent_requests(sender, instance, **kwargs):
+    # Pending requests sent by a deleted user go with it, without signals
+    to_user_ids = list(
+        FriendRequest.objects.filter(from_user=instance, accepted=False).values_list(
+            "to_user_id", flat=True
+        )
+    )
+    CustomUser.objects.add_pending_requests(to_user_ids, sign=-1)
+    FriendshipEvent.objects.record(
+        FriendshipEvent.REQUEST_CANCELLED,
+        [(to_user_id, instance.pk) for to_user_id in to_user_ids],
+    )
+
+
+@receiver(pre_delete, sender=CustomUser)
+def remove_deleted_user_friendships(sender, instance, **kwargs):
+    # One counter update and one feed insert for all of the user's friends,
+    # instead of one of each per friendship row of the cascade
+    friend_ids = Friend.objects.friend_ids(instance)
+    if not friend_ids:
+        return
+    pairs = [(friend_id, instance.pk) for friend_id in friend_ids]
+    CustomUser.objects.bump_friends_version([], dict.fromkeys(friend_ids, -1))
+    # Only the friends' side, the user's own events go with it
+    FriendshipEvent.objects.record(FriendshipEvent.FRIEND_REMOVED, pairs)
+    transaction.on_commit(
+        lambda: friend_graph.remove_edges(pairs + [(b, a) for a, b in pairs])
+    )
+
+
+@receiver(post_delete, sender=CustomUser)
+def delete_friendship_events(sender, instance, **kwargs):
+    # The feed has no foreign key constraint, its events were written up to
+    # the deletion of the user's friendships just before. The newest entry of
+    # the feed is kept, so ids are not reused and cursors stay comparable.
+    newest = FriendshipEvent.objects.order_by("-id").values("id")[:1]
+    FriendshipEvent.objects.filter(user_id=instance.pk).exclude(id__in=newest).delete()
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    # PRAGMAs are per connection, so run them whenever one is opened
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # Count and time queries for the request metrics, once per connection
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,186 @@
+"""
+Friend-of-friend suggestions.
+
+A user's candidates are the friends of their friends they are not already
+friends with, ranked by the number of mutual friends. Counting is done on a
+sparse adjacency map (effectively one row of ``A @ A`` per user) loaded in
+bulk, and the top K candidates per user are stored in ``FriendSuggestion``.
+
+The full graph is processed in batches of users by the
+``compute_friend_suggestions`` command; when a friendship is accepted only
+the users whose counts can change are refreshed, on a background thread
+(``refresh_queue``) so the accepting request does not wait for it.
+"""
+
+import heapq
+import logging
+import os
+import queue
+import threading
+from collections import Counter
+from itertools import chain
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import CustomUser, Friend, FriendSuggestion
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+LOAD_CHUNK_SIZE = 500
+
+
+def get_top_k():
+    return getattr(settings, "FRIEND_SUGGESTIONS_TOP_K", 20)
+
+
+def load_adjacency(user_ids):
+    """
+    Return {user_id: set of friend ids} for the given users.
+    """
+    user_ids = list(user_ids)
+    adjacency = {user_id: set() for user_id in user_ids}
+    for start in range(0, len(user_ids), LOAD_CHUNK_SIZE):
+        chunk = user_ids[start : start + LOAD_CHUNK_SIZE]
+        for user_id, friend_id in Friend.objects.friend_pairs(chunk):
+            adjacency[user_id].add(friend_id)
+    return adjacency
+
+
+def rank_candidates(user_id, adjacency, top_k):
+    """
+    Return the top_k (candidate_id, mutual_friends) pairs for a user.
+    """
+    friends = adjacency.get(user_id, set())
+    counts = Counter(
+        candidate
+        for friend_id in friends
+        for candidate in adjacency.get(friend_id, ())
+        if candidate != user_id and candidate not in friends
+    )
+    # Most mutual friends first, lowest id breaks ties
+    return heapq.nsmallest(top_k, counts.items(), key=lambda item: (-item[1], item[0]))
+
+
+def compute_suggestions(user_ids, top_k=None):
+    """
+    Recompute and store the suggestions of the given users.
+    """
+    top_k = top_k or get_top_k()
+    user_ids = set(user_ids)
+    adjacency = load_adjacency(user_ids)
+    second_hop = set(chain.from_iterable(adjacency.values())) - adjacency.keys()
+    adjacency.update(load_adjacency(second_hop))
+
+    suggestions = [
+        FriendSuggestion(
+            user_id=user_id, suggested_user_id=candidate, mutual_friends=count
+        )
+        for user_id in user_ids
+        for candidate, count in rank_candidates(user_id, adjacency, top_k)
+    ]
+    with transaction.atomic():
+        FriendSuggestion.objects.filter(user_id__in=user_ids).delete()
+        FriendSuggestion.objects.bulk_create(suggestions, batch_size=1000)
+    return len(suggestions)
+
+
+def compute_all_suggestions(batch_size=1000, top_k=None):
+    """
+    Recompute the suggestions of every user, one batch of users at a time.
+    Yields (users processed, suggestions stored) after each batch.
+    """
+    last_id = 0
+    processed = 0
+    while True:
+        batch = list(
+            CustomUser.objects.filter(pk__gt=last_id)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not batch:
+            return
+        stored = compute_suggestions(batch, top_k)
+        processed += len(batch)
+        last_id = batch[-1]
+        yield processed, stored
+
+
+def refresh_for_friendships(pairs):
+    """
+    Refresh the suggestions affected by new (user_id, friend_id) friendships.
+
+    The two new friends and all of their friends can see their counts change.
+    When that set exceeds FRIEND_SUGGESTIONS_MAX_FANOUT only the two new
+    friends are refreshed and the rest waits for the next full run.
+    """
+    endpoints = set(chain.from_iterable(pairs))
+    affected = set(endpoints)
+    for friend_ids in load_adjacency(endpoints).values():
+        affected |= friend_ids
+    if len(affected) > getattr(settings, "FRIEND_SUGGESTIONS_MAX_FANOUT", 2000):
+        affected = endpoints
+    compute_suggestions(affected)
+
+
+def refresh_safely(pairs):
+    # The friendships are committed already, a failed refresh only leaves
+    # suggestions stale until the next full run
+    try:
+        refresh_for_friendships(pairs)
+    except Exception:
+        logger.exception("Refreshing friend suggestions failed")
+
+
+class RefreshQueue:
+    """
+    Refresh suggestions for new friendships on a background thread.
+
+    The thread is started on first use (again after a fork). When the queue
+    is full, refreshes are dropped (and counted in ``dropped``) rather than
+    blocking the caller; the next full run catches up.
+    """
+
+    def __init__(self, maxsize=1000):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._pid = None
+        self.dropped = 0
+
+    def submit(self, pairs):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(list(pairs))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Friend suggestion refresh queue is full, dropped a refresh")
+
+    def join(self):
+        """
+        Wait until every submitted refresh has run.
+        """
+        self._queue.join()
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                threading.Thread(
+                    target=self._run, name="friend-suggestions", daemon=True
+                ).start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            pairs = self._queue.get()
+            close_old_connections()
+            try:
+                refresh_safely(pairs)
+            finally:
+                close_old_connections()
+                self._queue.task_done()
+
+
+refresh_queue = RefreshQueue()
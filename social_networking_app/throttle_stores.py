@@ -0,0 +1,142 @@
+"""
+Counter stores backing the sliding-window throttles.
+
+A store only has to provide an atomic ``incr(key, ttl, delta)`` returning the
+new value and a ``get(key)``. The store in use is configured with the
+``THROTTLE_STORE`` setting::
+
+    THROTTLE_STORE = {
+        "BACKEND": "social_networking_app.throttle_stores.SQLiteCounterStore",
+        "OPTIONS": {"path": "/var/run/app/throttle.sqlite3"},
+    }
+"""
+
+import os
+import random
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+DEFAULT_STORE = {
+    "BACKEND": "social_networking_app.throttle_stores.CacheCounterStore",
+    "OPTIONS": {},
+}
+
+
+class CacheCounterStore:
+    """
+    Counters kept in a Django cache. ``incr`` is atomic on the Redis and
+    Memcached backends; with LocMemCache counters are per process.
+    """
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+
+    def incr(self, key, ttl, delta=1):
+        cache = caches[self.alias]
+        cache.add(key, 0, ttl)
+        try:
+            return cache.incr(key, delta)
+        except ValueError:
+            # The key expired between add() and incr()
+            cache.set(key, delta, ttl)
+            return delta
+
+    def get(self, key):
+        return caches[self.alias].get(key, 0)
+
+
+class NullCounterStore:
+    """
+    Counters that always read zero, so throttles never reject. For
+    benchmarks and load tests.
+    """
+
+    def incr(self, key, ttl, delta=1):
+        return 0
+
+    def get(self, key):
+        return 0
+
+
+class SQLiteCounterStore:
+    """
+    Counters kept in a local SQLite file, shared by every worker process on
+    the host. Each increment is a single upsert statement.
+    """
+
+    PRUNE_PROBABILITY = 0.001
+
+    def __init__(self, path, timeout=5):
+        self.path = str(path)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS throttle_counter ("
+                "key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def incr(self, key, ttl, delta=1):
+        now = time.time()
+        connection = self._connection()
+        (value,) = connection.execute(
+            "INSERT INTO throttle_counter (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            "value = CASE WHEN expires_at <= ? THEN excluded.value "
+            "ELSE value + excluded.value END, "
+            "expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at "
+            "ELSE expires_at END "
+            "RETURNING value",
+            (key, delta, now + ttl, now, now),
+        ).fetchone()
+        if random.random() < self.PRUNE_PROBABILITY:
+            connection.execute(
+                "DELETE FROM throttle_counter WHERE expires_at <= ?", (now,)
+            )
+        return value
+
+    def get(self, key):
+        row = (
+            self._connection()
+            .execute(
+                "SELECT value FROM throttle_counter WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        return row[0] if row else 0
+
+
+@lru_cache(maxsize=None)
+def get_throttle_store():
+    """
+    Return the configured counter store instance.
+    """
+    config = getattr(settings, "THROTTLE_STORE", DEFAULT_STORE)
+    return import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+
+
+@receiver(setting_changed)
+def reset_throttle_store(setting, **kwargs):
+    if setting == "THROTTLE_STORE":
+        get_throttle_store.cache_clear()
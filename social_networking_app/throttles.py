@@ -1,8 +1,81 @@
 from rest_framework.throttling import UserRateThrottle
 
+from .throttle_stores import get_throttle_store
 
-class FriendRequestThrottle(UserRateThrottle):
+
+class SlidingWindowRateThrottle(UserRateThrottle):
+    """
+    User rate throttle using a sliding-window counter.
+
+    Instead of a growing list of request timestamps, each client has one
+    counter per fixed window in the shared ``THROTTLE_STORE``. The request
+    rate is estimated as the current window's count plus the previous
+    window's count weighted by how much of it still overlaps the sliding
+    window, so every check costs one increment and one read.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        store = self.get_store()
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        current_key = f"{self.key}:{window}"
+        self.current = store.incr(current_key, ttl=2 * self.duration)
+        self.previous = store.get(f"{self.key}:{window - 1}")
+        if self.estimate() > self.num_requests:
+            # Rejected requests do not use up the quota
+            store.incr(current_key, ttl=2 * self.duration, delta=-1)
+            self.current -= 1
+            return self.throttle_failure()
+        return self.throttle_success()
+
+    def get_store(self):
+        return get_throttle_store()
+
+    def throttle_success(self):
+        return True
+
+    def elapsed_fraction(self):
+        # How far into the current fixed window we are, between 0 and 1
+        return (self.now % self.duration) / self.duration
+
+    def estimate(self):
+        return self.previous * (1 - self.elapsed_fraction()) + self.current
+
+    def wait(self):
+        """
+        Seconds until one more request fits in the sliding window.
+        """
+        offset = self.now % self.duration
+        if self.previous and self.current + 1 <= self.num_requests:
+            # Wait for the previous window's weight to decay enough:
+            # previous * (1 - fraction) + current + 1 <= num_requests
+            fraction = 1 - (self.num_requests - self.current - 1) / self.previous
+            return max(0.0, fraction * self.duration - offset)
+        # Wait for the next window, where the current count becomes the
+        # decaying previous one: current * (1 - fraction) + 1 <= num_requests
+        fraction = max(0.0, 1 - (self.num_requests - 1) / max(self.current, 1))
+        return self.duration - offset + fraction * self.duration
+
+
+class UserThrottle(SlidingWindowRateThrottle):
+    scope = "user"
+
+
+class FriendRequestThrottle(SlidingWindowRateThrottle):
     scope = "friend_request"
 
-    def get_rate(self):
-        return "3/minute"
+
+class BulkFriendRequestThrottle(SlidingWindowRateThrottle):
+    scope = "bulk_friend_request"
+
+
+class AuthTokenThrottle(SlidingWindowRateThrottle):
+    # Keyed by client IP before login, slows down password guessing
+    scope = "auth_token"
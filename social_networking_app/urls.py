@@ -1,16 +1,56 @@
 from django.urls import include, path
 
+from social_networking_app.async_views import (
+    AsyncFriendListView,
+    AsyncPendingCountView,
+    AsyncPendingRequestsView,
+    AsyncUserSearchView,
+)
 from social_networking_app.views import (
+    AuthTokenViewSet,
+    BulkFriendRequestViewSet,
+    FriendChangesViewSet,
+    FriendGraphViewSet,
     FriendRequestStatus,
     FriendRequestViewSet,
+    FriendSuggestionViewSet,
     FriendViewSet,
+    RouteMetricsViewSet,
     UserSearchViewSet,
 
 )
 
 urlpatterns = [
     path("accounts/", include("allauth.urls")),
+    path(
+        "auth/token/",
+        AuthTokenViewSet.as_view({"post": "create", "delete": "destroy"}),
+        name="auth-token",
+    ),
     path("friend-list/", FriendViewSet.as_view(), name="friend-list"),
+    path(
+        "friend-list/ids/", FriendGraphViewSet.as_view({"get": "ids"}), name="friend-ids"
+    ),
+    path(
+        "friend-list/changes/",
+        FriendChangesViewSet.as_view({"get": "list"}),
+        name="friend-changes",
+    ),
+    path(
+        "friends/<int:user_id>/",
+        FriendGraphViewSet.as_view({"get": "check"}),
+        name="friend-check",
+    ),
+    path(
+        "friends/<int:user_id>/path/",
+        FriendGraphViewSet.as_view({"get": "path"}),
+        name="friend-path",
+    ),
+    path(
+        "friend-suggestions/",
+        FriendSuggestionViewSet.as_view(),
+        name="friend-suggestions",
+    ),
     path(
         "user-search/", UserSearchViewSet.as_view({"get": "list"}), name="user-search"
     ),
@@ -19,6 +59,21 @@ urlpatterns = [
         FriendRequestViewSet.as_view({"post": "create"}),
         name="friend-requests",
     ),
+    path(
+        "friend-requests/bulk/",
+        BulkFriendRequestViewSet.as_view({"post": "create"}),
+        name="friend-requests-bulk",
+    ),
+    path(
+        "friend-requests/bulk-accept/",
+        FriendRequestStatus.as_view({"post": "bulk_accept"}),
+        name="friend-requests-bulk-accept",
+    ),
+    path(
+        "friend-requests/bulk-reject/",
+        FriendRequestStatus.as_view({"post": "bulk_reject"}),
+        name="friend-requests-bulk-reject",
+    ),
     path(
         "friend-requests/<int:pk>/accept/",
         FriendRequestStatus.as_view({"post": "accept"}),
@@ -34,4 +89,31 @@ urlpatterns = [
         FriendRequestStatus.as_view({"get": "list_pending_requests"}),
         name="list-pending-requests",
     ),
+    path(
+        "friend-requests/pending-count/",
+        FriendRequestStatus.as_view({"get": "count_pending_requests"}),
+        name="pending-requests-count",
+    ),
+    path(
+        "metrics/routes/",
+        RouteMetricsViewSet.as_view({"get": "list"}),
+        name="route-metrics",
+    ),
+    # Async versions of the read endpoints, for ASGI deployments
+    path(
+        "async/friend-list/", AsyncFriendListView.as_view(), name="async-friend-list"
+    ),
+    path(
+        "async/user-search/", AsyncUserSearchView.as_view(), name="async-user-search"
+    ),
+    path(
+        "async/friend-requests/list-pending-requests/",
+        AsyncPendingRequestsView.as_view(),
+        name="async-list-pending-requests",
+    ),
+    path(
+        "async/friend-requests/pending-count/",
+        AsyncPendingCountView.as_view(),
+        name="async-pending-requests-count",
+    ),
 ]
@@ -0,0 +1,82 @@
+"""
+Logged in users loaded from the cache instead of the database.
+
+``CachedUserAuthenticationMiddleware`` replaces Django's
+``AuthenticationMiddleware``. It resolves the user id stored in the session
+from the default cache for ``USER_CACHE_TIMEOUT`` seconds, and only falls
+back to ``django.contrib.auth.get_user`` (one query) on a miss. The session
+auth hash is still checked on every request, so changing the password logs
+out other sessions as before.
+
+Cached users are deleted when the user is saved or deleted, or has its
+friends version bumped, see ``signals.py``. The cache must be shared by every
+worker (Redis, Memcached through ``CACHE_URL``) for that to reach them all, so
+the user cache is off by default and a system check rejects it on a
+per-process LocMemCache.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+
+def user_cache_key(user_id):
+    return f"auth-user:{user_id}"
+
+
+def invalidate_users(*user_ids):
+    cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+def load_user(request):
+    """
+    Return the user logged in to the request session, from the cache when
+    possible.
+    """
+    timeout = getattr(settings, "USER_CACHE_TIMEOUT", 0)
+    session = request.session
+    try:
+        user_id = auth.get_user_model()._meta.pk.to_python(session[SESSION_KEY])
+        backend_path = session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if not timeout or backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return auth.get_user(request)
+
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is not None and constant_time_compare(
+        session.get(HASH_SESSION_KEY, ""), user.get_session_auth_hash()
+    ):
+        return user
+    # Misses and hash mismatches take the full path, which also verifies
+    # fallback secrets and flushes sessions that no longer match
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(key, user, timeout)
+    return user
+
+
+def get_user(request):
+    if not hasattr(request, "_cached_user"):
+        request._cached_user = load_user(request)
+    return request._cached_user
+
+
+async def auser(request):
+    if not hasattr(request, "_acached_user"):
+        request._acached_user = await sync_to_async(load_user)(request)
+    return request._acached_user
+
+
+class CachedUserAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)  # Checks the session middleware
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.auser = lambda: auser(request)
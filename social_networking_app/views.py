@@ -1,21 +1,95 @@
+import hashlib
 import logging
 import django_filters
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, Max, Min, OuterRef, Q
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.dateparse import parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, permissions, status, viewsets
 from rest_framework.exceptions import PermissionDenied
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.authtoken.models import Token
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from .models import CustomUser, Friend, FriendRequest
+from .friend_cache import friend_graph
+from .instrumentation import route_stats
+from .models import (
+    MAX_ID,
+    CustomUser,
+    Friend,
+    FriendRequest,
+    FriendshipEvent,
+    FriendSuggestion,
+)
+from .pagination import CustomPagination, KeysetPagination, SelectablePaginationMixin
+from .paths import get_max_depth, shortest_path
+from .search import search_users
 from .serializers import (
+    AuthTokenSerializer,
+    BulkFriendRequestActionSerializer,
+    BulkFriendRequestSerializer,
     FriendRequestSerializer,
     FriendSerializer,
-    UserSignupSerializer
+    FriendSuggestionSerializer,
+    UserSearchSerializer,
+)
+from .throttles import (
+    AuthTokenThrottle,
+    BulkFriendRequestThrottle,
+    FriendRequestThrottle,
 )
-from .throttles import FriendRequestThrottle
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
+# Logs written on every request, rate limited in LOGGING
+request_logger = logging.getLogger(f"{__name__}.requests")
+
+
+def parse_since(value):
+    # Parse an ISO 8601 'since' filter, None when it is not a valid datetime
+    try:
+        since = parse_datetime(value)
+    except ValueError:  # Well formed but out of range, e.g. month 13
+        return None
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+class AuthTokenViewSet(viewsets.ViewSet):
+    """
+    ViewSet exchanging credentials for an API token, and revoking it.
+    """
+
+    throttle_classes = [AuthTokenThrottle]
+
+    def get_permissions(self):
+        if self.action == "destroy":
+            return [IsAuthenticated()]
+        return []
+
+    def create(self, request):
+        # Check the password once, later requests send the token instead.
+        serializer = AuthTokenSerializer(data=request.data, context={"request": request})
+        if not serializer.is_valid():
+            logger.warning("Invalid credentials for an API token")
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        token, _ = Token.objects.get_or_create(user=serializer.validated_data["user"])
+        return Response({"token": token.key})
+
+    def destroy(self, request):
+        # Revoke the current user's token. Other workers refuse it on its next
+        # request with a shared cache, within AUTH_TOKEN_CACHE_TTL otherwise.
+        Token.objects.filter(user=request.user).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class FriendRequestViewSet(viewsets.ViewSet):
@@ -32,15 +106,33 @@ class FriendRequestViewSet(viewsets.ViewSet):
         """
         Handle POST request for creating friend requests.
         """
-        logger.info("Friend request creation request received")  # Log an info message
+        request_logger.info("Friend request creation request received")  # Log an info message
         serializer = FriendRequestSerializer(data=request.data)
         if serializer.is_valid():
             to_email = serializer.validated_data.get("to_user")
-            try:
-                to_user = CustomUser.objects.get(email=to_email)
-            except CustomUser.DoesNotExist:
+            # Resolve the recipient and every duplicate check in one query
+            to_user = (
+                CustomUser.objects.filter(email=to_email)
+                .annotate(
+                    request_received=Exists(
+                        FriendRequest.objects.filter(
+                            from_user=OuterRef("pk"), to_user=request.user
+                        )
+                    ),
+                    request_sent=Exists(
+                        FriendRequest.objects.filter(
+                            from_user=request.user, to_user=OuterRef("pk")
+                        )
+                    ),
+                    already_friends=Exists(
+                        Friend.objects.between(request.user, OuterRef("pk"))
+                    ),
+                )
+                .first()
+            )
+            if to_user is None:
                 logger.error(
-                    f"User with email {to_email} does not exist."
+                    "User with email %s does not exist.", to_email
                 )  # Log an error message
                 return Response(
                     {"error": f"User with email {to_email} does not exist."},
@@ -56,10 +148,16 @@ class FriendRequestViewSet(viewsets.ViewSet):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            existing_request_to_user = FriendRequest.objects.filter(
-                from_user=to_user, to_user=request.user
-            ).exists()
-            if existing_request_to_user:
+            if to_user.already_friends:
+                logger.warning(
+                    "User attempted to send a friend request to an existing friend"
+                )  # Log a warning message
+                return Response(
+                    {"error": "You are already friends with this user."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            if to_user.request_received:
                 logger.warning(
                     "User attempted to send a friend request to a user who has already sent them a request"
                 )  # Log a warning message
@@ -68,10 +166,17 @@ class FriendRequestViewSet(viewsets.ViewSet):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            existing_request_from_user = FriendRequest.objects.filter(
-                from_user=request.user, to_user=to_user
-            ).exists()
-            if existing_request_from_user:
+            duplicate = to_user.request_sent
+            if not duplicate:
+                try:
+                    with transaction.atomic():
+                        FriendRequest.objects.create(
+                            from_user=request.user, to_user=to_user
+                        )
+                except IntegrityError:
+                    # A duplicate sent concurrently hit the unique constraint
+                    duplicate = True
+            if duplicate:
                 logger.warning(
                     "User attempted to send a duplicate friend request"
                 )  # Log a warning message
@@ -80,7 +185,6 @@ class FriendRequestViewSet(viewsets.ViewSet):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            FriendRequest.objects.create(from_user=request.user, to_user=to_user)
             logger.info("Friend request sent successfully")  # Log an info message
             return Response(
                 {"message": "Friend request sent successfully."},
@@ -91,11 +195,92 @@ class FriendRequestViewSet(viewsets.ViewSet):
         )  # Log an error message
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class BulkFriendRequestViewSet(viewsets.ViewSet):
+    """
+    ViewSet for sending friend requests to many users at once, e.g. when
+    importing contacts.
+    """
+
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [BulkFriendRequestThrottle]  # One call is one operation
+
+    def create(self, request):
+        """
+        Handle POST request for creating friend requests in bulk.
+        """
+        request_logger.info("Bulk friend request creation request received")
+        serializer = BulkFriendRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.error("Invalid data provided for bulk friend request creation")
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        emails = list(
+            dict.fromkeys(
+                CustomUser.objects.normalize_email(email)
+                for email in serializer.validated_data["emails"]
+            )
+        )
+        user_ids = dict(
+            CustomUser.objects.filter(email__in=emails).values_list("email", "pk")
+        )
+        other_ids = set(user_ids.values()) - {request.user.pk}
+
+        # Existing requests in either direction and friendships, set-based
+        sent, received = set(), set()
+        for from_user_id, to_user_id in FriendRequest.objects.filter(
+            Q(from_user=request.user, to_user__in=other_ids)
+            | Q(from_user__in=other_ids, to_user=request.user)
+        ).values_list("from_user_id", "to_user_id"):
+            if from_user_id == request.user.pk:
+                sent.add(to_user_id)
+            else:
+                received.add(from_user_id)
+        friends = Friend.objects.friend_ids(request.user, among=other_ids)
+
+        results = []
+        to_create = {}
+        for email in emails:
+            user_id = user_ids.get(email)
+            if user_id is None:
+                result = "not_found"
+            elif user_id == request.user.pk:
+                result = "self"
+            elif user_id in friends:
+                result = "already_friends"
+            elif user_id in received:
+                result = "already_received"
+            elif user_id in sent:
+                result = "already_sent"
+            else:
+                result = "sent"
+                to_create[user_id] = len(results)
+            results.append({"email": email, "status": result})
+
+        # Requests sent concurrently are left out by send()
+        created = FriendRequest.objects.send(
+            (request.user.pk, user_id) for user_id in to_create
+        )
+        sent = {to_user_id for _, to_user_id in created}
+        for user_id, position in to_create.items():
+            if user_id not in sent:
+                results[position]["status"] = "already_sent"
+        logger.info("Bulk friend requests sent: %d", len(created))
+        return Response(
+            {"sent": len(created), "results": results},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+
 class FriendRequestStatus(viewsets.ViewSet):
     """
     ViewSet for managing friend request status (accept, reject, list pending requests).
     """
 
+    pagination_class = KeysetPagination
+    cursor_ordering = ("created_at", "id")
+    total_count_field = "pending_request_count"
+    total_count_filters = ("since",)  # The counter holds every pending request
+
     def accept(self, request, pk):
 
         # Handle accepting a friend request.
@@ -121,10 +306,17 @@ class FriendRequestStatus(viewsets.ViewSet):
                     {"error": "This friend request has already been accepted."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
+            elif not friend_request.accept():
+                # Another request accepted it first
+                logger.warning(
+                    "Attempted to accept already processed friend request"
+                )  # Log a warning message
+                return Response(
+                    {"error": "This friend request has already been accepted."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
             else:
-                # Accept the friend request and delete it
-                friend_request.accept()
-                friend_request.delete()
+                # The request is removed as part of accepting it
                 logger.info(
                     "Friend request accepted successfully"
                 )  # Log an info message
@@ -180,6 +372,44 @@ class FriendRequestStatus(viewsets.ViewSet):
             )
         return Response({"detail": "Friend request rejected successfully."})
 
+    def bulk_accept(self, request):
+
+        # Accept many received friend requests at once.
+        return self.process_in_bulk(request, "accepted")
+
+    def bulk_reject(self, request):
+
+        # Reject many received friend requests at once.
+        return self.process_in_bulk(request, "rejected")
+
+    def process_in_bulk(self, request, outcome):
+        serializer = BulkFriendRequestActionSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.error("Invalid data provided for bulk friend request %s", outcome)
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # Restricting to requests received by the user validates ownership
+        friend_requests = self.pending_requests(request)
+        requested_ids = serializer.validated_data.get("ids")
+        if requested_ids is not None:
+            friend_requests = friend_requests.filter(pk__in=requested_ids)
+        else:
+            friend_requests = friend_requests.filter(
+                created_at__lt=serializer.validated_data["before"]
+            )
+
+        if outcome == "accepted":
+            processed = friend_requests.accept()
+        else:
+            processed = friend_requests.reject()
+        logger.info("Friend requests %s in bulk: %d", outcome, len(processed))
+
+        body = {outcome: sorted(processed)}
+        if requested_ids is not None:
+            # Unknown ids, other users' requests and already processed ones
+            body["not_found"] = sorted(set(requested_ids) - set(processed))
+        return Response(body, status=status.HTTP_200_OK)
+
     def get_friend_request(self, pk):
 
         # Retrieve a friend request by its ID.
@@ -189,40 +419,39 @@ class FriendRequestStatus(viewsets.ViewSet):
             logger.error("Friend request not found")  # Log an error message
             return None
 
-    def list_pending_requests(self, request):
+    def pending_requests(self, request):
+        # Pending friend requests received by the current user
+        return FriendRequest.objects.filter(to_user=request.user, accepted=False)
 
-        # List pending friend requests for the current user.
-        friend_requests = FriendRequest.objects.filter(
-            to_user=request.user, accepted=False
-        )
-        friend_requests_with_emails = []
-        for request in friend_requests:
-            from_user_email = request.from_user.email
-            friend_requests_with_emails.append({"from_user_email": from_user_email})
-        return Response(friend_requests_with_emails, status=status.HTTP_200_OK)
+    def list_pending_requests(self, request):
 
+        # List pending friend requests for the current user, newest last.
+        friend_requests = self.pending_requests(request)
+        since = request.query_params.get("since")
+        if since:
+            since_datetime = parse_since(since)
+            if since_datetime is None:
+                logger.warning("Invalid 'since' filter for pending requests")
+                return Response(
+                    {"error": "'since' must be an ISO 8601 datetime."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            friend_requests = friend_requests.filter(created_at__gt=since_datetime)
 
-class CustomPagination(PageNumberPagination):
-    """
-    Custom pagination class to handle paginated responses.
-    """
+        # Project the sender email through a single join instead of per row
+        friend_requests = friend_requests.values(
+            "id", "created_at", from_user_email=F("from_user__email")
+        )
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(friend_requests, request, view=self)
+        return paginator.get_paginated_response(page)
 
-    page_size = 10  # Specify the number of items per page
-    page_size_query_param = "page_size"
-    max_page_size = 1000  # Optionally specify the maximum page size
+    def count_pending_requests(self, request):
 
-    def get_paginated_response(self, data):
-        """
-        Generate paginated response.
-        """
-        logger.debug("Paginated response created")  # Log a debug message
+        # Count pending friend requests, e.g. for an inbox badge.
         return Response(
-            {
-                "next": self.get_next_link(),
-                "previous": self.get_previous_link(),
-                "count": self.page.paginator.count,
-                "results": data,
-            }
+            {"count": request.user.pending_request_count},
+            status=status.HTTP_200_OK,
         )
 
 
@@ -236,12 +465,13 @@ class UserFilter(django_filters.FilterSet):
         fields = ["email", "username"]  # Define the fields you want to filter on
 
 
-class UserSearchViewSet(viewsets.ViewSet):
+class UserSearchViewSet(SelectablePaginationMixin, viewsets.ViewSet):
     """
     ViewSet for searching users.
     """
 
     pagination_class = CustomPagination  # Use the custom pagination class
+    cursor_ordering = ("search_rank", "id")  # Keyset used with ?pagination=cursor
     filter_backends = [DjangoFilterBackend]  # Specify the filter backend
     filterset_class = UserFilter  # Specify the filter class
 
@@ -249,28 +479,27 @@ class UserSearchViewSet(viewsets.ViewSet):
         """
         List users based on search query.
         """
-        logger.info("User search request received")  # Log an info message
+        request_logger.info("User search request received")  # Log an info message
         search_keyword = request.query_params.get("q")
         if search_keyword:
-            users = CustomUser.objects.all().order_by(
-                "id"
-            )  # Example ordering by id, replace with appropriate field
-            paginator = self.pagination_class()
+            users = search_users(search_keyword)  # Ranked by relevance, then id
+            users = users.only(*UserSearchSerializer.Meta.fields)
+            paginator = self.paginator
 
             # Apply pagination
-            page = paginator.paginate_queryset(users, request)
+            page = paginator.paginate_queryset(users, request, view=self)
             if page is not None:
-                serializer = UserSignupSerializer(page, many=True)
+                serializer = UserSearchSerializer(page, many=True)
                 return paginator.get_paginated_response(serializer.data)
 
-            serializer = UserSignupSerializer(users, many=True)
+            serializer = UserSearchSerializer(users, many=True)
             return Response(serializer.data)
         else:
             logger.warning("Search keyword is missing")  # Log a warning message
             return Response({"error": "Search keyword 'q' is required."}, status=400)
 
 
-class FriendViewSet(generics.ListAPIView):
+class FriendViewSet(SelectablePaginationMixin, generics.ListAPIView):
     """
     ViewSet for managing friend relationships.
     """
@@ -278,10 +507,209 @@ class FriendViewSet(generics.ListAPIView):
     serializer_class = FriendSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPagination  # Use the custom pagination class
+    cursor_ordering = ("id",)  # Keyset used with ?pagination=cursor
+    total_count_field = "friend_count"
 
     def get_queryset(self):
         # Get the list of friends for the authenticated user.
-        logger.info("Friend list request received")  # Log an info message
+        request_logger.info("Friend list request received")  # Log an info message
         user = self.request.user
-        queryset = Friend.objects.filter(user=user).order_by("id")
+        queryset = Friend.objects.friend_list(user).order_by("id")
         return queryset
+
+    def list(self, request, *args, **kwargs):
+        # Unchanged lists are answered from the user's friends version alone.
+        # No Last-Modified: with one second resolution, a change made in the
+        # same second as the client's last fetch would get a 304.
+        etag = self.get_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self.get_page_response(request, etag)
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ["Authorization", "Cookie"])
+        return response
+
+    def get_etag(self, request):
+        # One ETag per friends version and page of the list. Row ids differ
+        # between friendship storages, so the storage is part of it too.
+        page = hashlib.md5(
+            f"{settings.FRIENDSHIP_STORAGE}:{request.get_full_path()}".encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+        return f'W/"{request.user.pk}-{request.user.friends_version}-{page}"'
+
+    def get_page_response(self, request, etag):
+        # Pages are cached as rendered JSON, the browsable API is not cached
+        timeout = (
+            settings.FRIEND_LIST_CACHE_TIMEOUT
+            if request.accepted_renderer.format == "json"
+            else 0
+        )
+        key = f"friend-list:{etag}:{request.accepted_media_type}"
+        if timeout:
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+
+        # Rows are already plain values, render them without a serializer
+        queryset = self.get_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(page)
+        else:
+            response = Response(list(queryset))
+        if timeout:
+            response.add_post_render_callback(
+                lambda rendered: cache.set(
+                    key, (rendered.content, rendered["Content-Type"]), timeout
+                )
+            )
+        return response
+
+
+class FriendSuggestionViewSet(generics.ListAPIView):
+    """
+    ViewSet for listing friend-of-friend suggestions.
+    """
+
+    serializer_class = FriendSuggestionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CustomPagination  # Use the custom pagination class
+
+    def get_queryset(self):
+        # Get the precomputed suggestions, most mutual friends first.
+        request_logger.info("Friend suggestions request received")  # Log an info message
+        return (
+            FriendSuggestion.objects.filter(user=self.request.user)
+            .select_related("suggested_user")
+            .order_by("-mutual_friends", "suggested_user")
+        )
+
+
+class FriendGraphViewSet(viewsets.ViewSet):
+    """
+    ViewSet for cheap friendship lookups served from the friend graph cache.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def ids(self, request):
+        # List the ids of the current user's friends.
+        request_logger.info("Friend ids request received")  # Log an info message
+        return Response({"ids": list(friend_graph.friend_ids(request.user.pk))})
+
+    def check(self, request, user_id):
+        # Check whether the current user is friends with another user.
+        if user_id > MAX_ID:
+            return self.user_not_found(user_id)
+        return Response(
+            {
+                "user_id": user_id,
+                "is_friend": friend_graph.are_friends(request.user.pk, user_id),
+            }
+        )
+
+    def path(self, request, user_id):
+        # Shortest friendship path from the current user to another user, up
+        # to ?max_depth= friendships.
+        if user_id > MAX_ID:
+            return self.user_not_found(user_id)
+        limit = get_max_depth()
+        try:
+            max_depth = int(request.query_params.get("max_depth", limit))
+        except ValueError:
+            max_depth = 0
+        if not 1 <= max_depth <= limit:
+            return Response(
+                {"error": f"'max_depth' must be an integer from 1 to {limit}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        path = shortest_path(request.user.pk, user_id, max_depth) or []
+        # One query for the emails on the path, or to tell unknown users apart
+        users = CustomUser.objects.filter(pk__in=path or [user_id])
+        emails = dict(users.values_list("pk", "email"))
+        if user_id not in emails:
+            return self.user_not_found(user_id)
+        return Response(
+            {
+                "user_id": user_id,
+                "degrees": len(path) - 1 if path else None,
+                "path": [{"id": pk, "email": emails.get(pk)} for pk in path],
+            }
+        )
+
+    def user_not_found(self, user_id):
+        # Ids past the 64-bit primary keys overflow the database parameters
+        return Response(
+            {"error": f"User {user_id} does not exist."},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+
+class FriendChangesViewSet(viewsets.ViewSet):
+    """
+    ViewSet for syncing the friend list and pending requests incrementally.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    page_size = 100
+    max_page_size = 1000
+
+    def list(self, request):
+        # Changes after the ?since= cursor, oldest first. Without a cursor only
+        # the current one is returned, to sync from after a full download.
+        since = request.query_params.get("since")
+        if since is None:
+            latest = FriendshipEvent.objects.aggregate(latest=Max("id"))["latest"]
+            return Response({"cursor": latest or 0, "has_more": False, "changes": []})
+        try:
+            since = int(since)
+            page_size = int(request.query_params.get("page_size", self.page_size))
+        except ValueError:
+            since = page_size = -1
+        if not 0 <= since <= MAX_ID or not 1 <= page_size <= MAX_ID:
+            return Response(
+                {"error": "'since' and 'page_size' must be non-negative integers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        page_size = min(page_size, self.max_page_size)
+
+        changes = list(
+            FriendshipEvent.objects.changes(request.user, since)[: page_size + 1]
+        )
+        # Checked after the read, so a compaction running meanwhile is noticed.
+        # The newest entry is never deleted, so a cursor past it or into an
+        # empty feed was handed out before entries were lost.
+        bounds = FriendshipEvent.objects.aggregate(first=Min("id"), last=Max("id"))
+        if bounds["first"] is None:
+            gone = since > 0
+        else:
+            gone = since < bounds["first"] - 1 or since > bounds["last"]
+        if gone:
+            return Response(
+                {"error": "Changes since this cursor were compacted, download the friend list again."},
+                status=status.HTTP_410_GONE,
+            )
+        has_more = len(changes) > page_size
+        changes = changes[:page_size]
+        return Response(
+            {
+                "cursor": changes[-1]["id"] if changes else since,
+                "has_more": has_more,
+                "changes": changes,
+            }
+        )
+
+
+class RouteMetricsViewSet(viewsets.ViewSet):
+    """
+    ViewSet exposing this process's rolling per-route request metrics.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def list(self, request):
+        # Latency percentiles and query counts of recent requests, by route.
+        return Response(route_stats.summary())
@@ -23,6 +23,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 import os
 from dotenv import load_dotenv
 
+from .cache import cache_config
+from .database import database_config
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -40,6 +43,9 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 
 # Database URL
 DATABASE_URL = os.getenv('DATABASE_URL')
+# wsgi or asgi, set by asgi.py. Persistent database connections are off
+# by default under ASGI (see settings/database.py)
+SERVER_INTERFACE = os.getenv('SERVER_INTERFACE', 'wsgi')
 
 # SECURITY WARNING: keep the secret key used in production secret!
 # SECRET_KEY = "django-insecure-xb$rn&d&(1di6j1a07x8$nx+0e8l-89=@7-a7@=5f#_u_x(rzt"
@@ -72,11 +78,12 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = "social_networking_app.CustomUser"
 
 MIDDLEWARE = [
+    "social_networking_app.instrumentation.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "social_networking_app.user_cache.CachedUserAuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
@@ -143,22 +150,29 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 100,
+    "DEFAULT_RENDERER_CLASSES": [
+        "social_networking_app.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.SessionAuthentication",
         "rest_framework.authentication.BasicAuthentication",
-        "rest_framework.authentication.TokenAuthentication",
+        "social_networking_app.authentication.CachedTokenAuthentication",
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'social_networking_app.throttles.FriendRequestThrottle',
+        'social_networking_app.throttles.UserThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
+        'user': '600/minute',
         'friend_request': '3/minute',
+        'bulk_friend_request': '5/hour',
+        'auth_token': '10/minute',
     }
 }
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -181,31 +195,146 @@ ACCOUNT_UNIQUE_EMAIL = True
 LOGIN_REDIRECT_URL = 'friend-list'
 ACCOUNT_LOGOUT_REDIRECT_URL = '/'
 
+# In-process friend graph cache (see social_networking_app/friend_cache.py)
+FRIEND_GRAPH_CACHE_MAX_BYTES = int(os.getenv('FRIEND_GRAPH_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+FRIEND_GRAPH_CACHE_TTL = int(os.getenv('FRIEND_GRAPH_CACHE_TTL', 60))
+
+# Default cache from CACHE_URL (redis://... or memcached://...), a per-process
+# LocMemCache without it (see settings/cache.py)
+CACHES = {"default": cache_config(os.getenv('CACHE_URL'))}
+
+# Sessions and logged in users. SESSION_BACKEND is one of db, cached_db,
+# cache or signed_cookies (session data readable by the client, and only
+# revoked when it expires). Logged in users are kept in the default cache
+# for USER_CACHE_TIMEOUT seconds, 0 loads them from the database on every
+# request (see social_networking_app/user_cache.py). cached_db, cache and
+# the user cache need a shared CACHE_URL, a system check enforces it.
+SESSION_ENGINE = f"django.contrib.sessions.backends.{os.getenv('SESSION_BACKEND', 'db')}"
+USER_CACHE_TIMEOUT = int(os.getenv('USER_CACHE_TIMEOUT', 0))
+
+# Token to user lookups cached per process, revocations reach the other
+# workers through a shared CACHE_URL (see social_networking_app/authentication.py)
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 30))
+
+# Friend list conditional GETs and page cache. ETags follow the user's
+# friends_version; rendered pages are cached for this many seconds (0 is off)
+FRIEND_LIST_CACHE_TIMEOUT = int(os.getenv('FRIEND_LIST_CACHE_TIMEOUT', 0))
+
+# Friendship storage: "symmetric" keeps two Friend rows per friendship,
+# "canonical" one Friendship row with low_id < high_id. Move existing rows
+# with `manage.py migrate_friendships` before switching.
+FRIENDSHIP_STORAGE = os.getenv('FRIENDSHIP_STORAGE', 'symmetric')
+# Also write friendships to the other storage while migrate_friendships runs
+FRIENDSHIP_DUAL_WRITE = os.getenv('FRIENDSHIP_DUAL_WRITE', '0') == '1'
+
+# Pending friend requests older than this many days are archived by
+# `manage.py prune_friend_requests` (0 keeps them forever)
+FRIEND_REQUEST_TTL_DAYS = int(os.getenv('FRIEND_REQUEST_TTL_DAYS', 90))
+
+# Friend list change feed entries older than this many days are removed by
+# `manage.py compact_friendship_events`, clients with older cursors resync
+FRIENDSHIP_EVENT_RETENTION_DAYS = int(os.getenv('FRIENDSHIP_EVENT_RETENTION_DAYS', 30))
+
+# Friend-of-friend suggestions (see social_networking_app/suggestions.py).
+# Accepted friendships refresh the affected users, on a background thread
+# unless FRIEND_SUGGESTIONS_BACKGROUND is off
+FRIEND_SUGGESTIONS_TOP_K = int(os.getenv('FRIEND_SUGGESTIONS_TOP_K', 20))
+FRIEND_SUGGESTIONS_INCREMENTAL = os.getenv('FRIEND_SUGGESTIONS_INCREMENTAL', '1') == '1'
+FRIEND_SUGGESTIONS_BACKGROUND = os.getenv('FRIEND_SUGGESTIONS_BACKGROUND', '1') == '1'
+FRIEND_SUGGESTIONS_MAX_FANOUT = int(os.getenv('FRIEND_SUGGESTIONS_MAX_FANOUT', 2000))
+
+# User search reads at most this many users of the query's rarest trigram,
+# trigram frequencies are kept in the default cache for
+# SEARCH_FREQUENCY_CACHE_TIMEOUT seconds (see social_networking_app/search.py)
+SEARCH_MAX_CANDIDATES = int(os.getenv('SEARCH_MAX_CANDIDATES', 1000))
+SEARCH_FREQUENCY_CACHE_TIMEOUT = int(os.getenv('SEARCH_FREQUENCY_CACHE_TIMEOUT', 600))
+
+# Degrees of separation (see social_networking_app/paths.py). Searches read
+# adjacency through the friend graph cache unless FRIEND_PATH_USE_CACHE is off
+FRIEND_PATH_MAX_DEPTH = int(os.getenv('FRIEND_PATH_MAX_DEPTH', 6))
+FRIEND_PATH_USE_CACHE = os.getenv('FRIEND_PATH_USE_CACHE', '1') == '1'
+
+# Per-request query and timing metrics (see social_networking_app/instrumentation.py)
+REQUEST_METRICS_SERVER_TIMING = True
+REQUEST_METRICS_WINDOW = 1000  # Requests kept per route for the summary
+# Maximum queries per request, by route name. Going over logs a warning, and
+# raises when QUERY_BUDGET_ENFORCE is on (always the case in tests).
+QUERY_BUDGETS = {
+    'auth-token': 6,
+    'friend-list': 4,
+    'friend-ids': 3,
+    'friend-changes': 4,
+    'friend-check': 3,
+    'friend-path': 10,
+    'friend-suggestions': 4,
+    'user-search': 4,
+    'friend-requests': 6,
+    'friend-requests-bulk': 8,
+    'friend-requests-bulk-accept': 12,
+    'friend-requests-bulk-reject': 6,
+    'friend-requests-accept': 12,
+    'friend-requests-reject': 7,
+    'list-pending-requests': 3,
+    'pending-requests-count': 3,
+    'async-friend-list': 3,
+    'async-user-search': 3,
+    'async-list-pending-requests': 3,
+    'async-pending-requests-count': 3,
+}
+QUERY_BUDGET_ENFORCE = os.getenv('QUERY_BUDGET_ENFORCE', '0') == '1'
+TEST_RUNNER = 'social_networking_app.test_runner.QueryBudgetTestRunner'
 
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+    "default": database_config(DATABASE_URL, BASE_DIR / "db.sqlite3", SERVER_INTERFACE),
 }
 
+# Records are queued on the request thread and written by a background
+# thread, see social_networking_app/log_handlers.py. LOG_LEVEL is set per
+# environment; SQL statements are only logged with DB_LOG_LEVEL=DEBUG.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'rate_limit': {
+            '()': 'social_networking_app.log_handlers.RateLimitFilter',
+            'rate': 10,
+            'period': 1.0,
+            'sample_every': 100,
+        },
+    },
     'handlers': {
         'file': {
             'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': BASE_DIR /'logger.log',
+            'class': 'social_networking_app.log_handlers.BackgroundFileHandler',
+            'filename': BASE_DIR / 'logger.log',
             'formatter': 'verbose',
         },
     },
     'loggers': {
         'django': {
             'handlers': ['file'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
             'propagate': True,
         },
+        'django.db.backends': {
+            'level': os.getenv('DB_LOG_LEVEL', 'INFO'),
+        },
+        'social_networking_app': {
+            'handlers': ['file'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        # Logs written on every request
+        'social_networking_app.views.requests': {
+            'filters': ['rate_limit'],
+        },
+        'social_networking_app.async_views.requests': {
+            'filters': ['rate_limit'],
+        },
+        'social_networking_app.pagination': {
+            'filters': ['rate_limit'],
+        },
     },
     'formatters': {
         'verbose': {
@@ -0,0 +1,43 @@
+"""
+Cache configuration read from the environment.
+
+``CACHE_URL`` selects the default cache, for example::
+
+    CACHE_URL=redis://cache:6379/0
+    CACHE_URL=memcached://cache1:11211,cache2:11211
+
+Without it every process gets its own LocMemCache, which is not shared by
+gunicorn workers. Cached sessions and the logged in user cache need a shared
+cache, see ``social_networking_app/checks.py``.
+"""
+
+from urllib.parse import urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+LOCMEM_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+REDIS_SCHEMES = ("redis", "rediss")
+MEMCACHED_SCHEMES = ("memcached", "pymemcache")
+
+
+def cache_config(url):
+    """
+    Turn a cache URL into an entry of the ``CACHES`` setting.
+    """
+    if not url:
+        return {"BACKEND": LOCMEM_BACKEND}
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme in REDIS_SCHEMES:
+        # Needs the redis package
+        return {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": url,
+        }
+    if scheme in MEMCACHED_SCHEMES:
+        # Needs the pymemcache package
+        return {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": parts.netloc.split(","),
+        }
+    raise ImproperlyConfigured(f"Unsupported CACHE_URL scheme {parts.scheme!r}.")
@@ -0,0 +1,102 @@
+"""
+Database configuration read from the environment.
+
+``DATABASE_URL`` selects the backend, for example::
+
+    DATABASE_URL=postgres://user:password@db:5432/social?sslmode=require
+    DATABASE_URL=sqlite:////var/lib/app/db.sqlite3
+
+Without it the project uses the SQLite file next to the settings package.
+``DATABASE_CONN_MAX_AGE`` (seconds) controls persistent connections. They
+are on by default under WSGI and off under ASGI, where Django's async views
+and ``sync_to_async`` threads would leave connections open that are never
+reused or closed.
+"""
+
+import os
+from pathlib import Path
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+POSTGRES_SCHEMES = ("postgres", "postgresql", "pgsql")
+SQLITE_SCHEMES = ("sqlite",)
+# Persistent connection lifetime by SERVER_INTERFACE
+DEFAULT_CONN_MAX_AGE = {"wsgi": 60, "asgi": 0}
+
+# Applied to every new SQLite connection when tuning is enabled. WAL lets
+# readers proceed while a writer commits, NORMAL only syncs at checkpoints
+# (safe in WAL mode), and the busy timeout makes writers wait for the lock
+# instead of failing right away.
+TUNED_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+
+def parse_database_url(url, base_dir=None):
+    """
+    Turn a database URL into an entry of the ``DATABASES`` setting.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    options = dict(parse_qsl(parts.query))
+
+    if scheme in SQLITE_SCHEMES:
+        # sqlite:///relative.sqlite3, sqlite:////absolute.sqlite3, sqlite://:memory:
+        name = unquote(parts.path[1:]) or parts.netloc or ":memory:"
+        if name != ":memory:":
+            # Relative paths are relative to base_dir, absolute ones are kept
+            name = Path(base_dir or "") / name
+        return {"ENGINE": "django.db.backends.sqlite3", "NAME": name}
+
+    if scheme in POSTGRES_SCHEMES:
+        config = {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": unquote(parts.path[1:]),
+            "USER": unquote(parts.username or ""),
+            "PASSWORD": unquote(parts.password or ""),
+            "HOST": parts.hostname or "",
+            "PORT": str(parts.port or ""),
+        }
+        # Transaction-pooling proxies such as PgBouncer cannot keep the
+        # server-side cursors used by QuerySet.iterator()
+        if options.pop("disable_server_side_cursors", "").lower() in ("1", "true"):
+            config["DISABLE_SERVER_SIDE_CURSORS"] = True
+        if options:
+            config["OPTIONS"] = options
+        return config
+
+    raise ImproperlyConfigured(f"Unsupported DATABASE_URL scheme {parts.scheme!r}.")
+
+
+def database_config(url, default_sqlite_path, server="wsgi"):
+    """
+    Build the default database from ``url``, falling back to a SQLite file.
+    ``server`` is the interface the project is served with, wsgi or asgi.
+    """
+    if server not in DEFAULT_CONN_MAX_AGE:
+        raise ImproperlyConfigured(
+            f"SERVER_INTERFACE must be one of {', '.join(DEFAULT_CONN_MAX_AGE)}."
+        )
+    if url:
+        config = parse_database_url(url, base_dir=Path(default_sqlite_path).parent)
+    else:
+        config = {"ENGINE": "django.db.backends.sqlite3", "NAME": default_sqlite_path}
+    # Reuse connections across requests and check them before reuse
+    config["CONN_MAX_AGE"] = int(
+        os.getenv("DATABASE_CONN_MAX_AGE", DEFAULT_CONN_MAX_AGE[server])
+    )
+    config["CONN_HEALTH_CHECKS"] = True
+    return config
+
+
+def sqlite_pragmas(tuned):
+    """
+    Return the PRAGMAs to run on new SQLite connections. ``SQLITE_TUNED``
+    (0 or 1) overrides the environment's default.
+    """
+    tuned = os.getenv("SQLITE_TUNED", "1" if tuned else "0").lower() in ("1", "true")
+    return dict(TUNED_SQLITE_PRAGMAS) if tuned else {}
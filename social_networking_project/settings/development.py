@@ -3,5 +3,18 @@
 
 
 from .base import *
+from .database import sqlite_pragmas
 DEBUG = True
 
+# Throttle counters live in the default (per-process) cache
+THROTTLE_STORE = {
+    "BACKEND": "social_networking_app.throttle_stores.CacheCounterStore",
+    "OPTIONS": {"alias": "default"},
+}
+
+# SQLite keeps its default journal unless SQLITE_TUNED=1, switching to WAL
+# changes the database file itself
+SQLITE_PRAGMAS = sqlite_pragmas(tuned=False)
+
+# Level of the project and Django loggers, see LOGGING in base.py
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG")
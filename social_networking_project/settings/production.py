@@ -1,4 +1,18 @@
 from .base import *
+from .database import sqlite_pragmas
 
 # Additional development-specific settings can be added here
 DEBUG = False
+
+# Throttle counters shared by every worker on the host, point this to a
+# Redis cache with CacheCounterStore when running on several hosts
+THROTTLE_STORE = {
+    "BACKEND": "social_networking_app.throttle_stores.SQLiteCounterStore",
+    "OPTIONS": {"path": os.getenv("THROTTLE_DB_PATH", BASE_DIR / "throttle.sqlite3")},
+}
+
+# WAL, synchronous=NORMAL, busy timeout and mmap on every SQLite connection
+SQLITE_PRAGMAS = sqlite_pragmas(tuned=True)
+
+# Level of the project and Django loggers, see LOGGING in base.py
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING")